@@ -7,20 +7,29 @@ Solution:
 Bonus:
 1169723214
 
-Packages installed: sympy
+Packages installed: sympy, numpy
 """
 
 import argparse
 import json
+import math
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from copy import deepcopy
 from time import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, TextIO, Tuple
 
+import numpy as np
 from sympy.ntheory.modular import crt
 
+from lockstep import find_winning_steps_many
+from wins_cache import MAX_ENTRIES, WinsCache
+
 HanoiTower = Dict[int, List[Any]]
 WinningSteps = Dict[str, int | List[int]]
 GeneralWin = Tuple[int, int]  # represent a general winning step and its repetitions: 'winning_step + period * k'
+MAX_TABLE_DISKS = 13  # the most disks 'TableHanoi' keeps a transition table for (3^n states)
 
 
 class Hanoi:
@@ -99,6 +108,11 @@ class Hanoi:
         Since the winning steps are cyclic, it is enough to find all the winning steps in a single cycle
         and the cycle size (period).
 
+        The cycle is detected on the full state of the game (the rods, the location of disk "1" and the index
+        of the move in the moves string). Every move can be undone, so the states form a pure cycle
+        (the pre-period is 0), and the period is the first step at which the game returns to its starting state.
+        A game which has no winning state in its cycle never wins, and returns no phases.
+
         Each winning step is represented by:
         phases + period * k, where k is 0,1,2,...
         Where 'phase' is a winning step and 'period' represents how many more steps we will reach a winning state again.
@@ -115,27 +129,23 @@ class Hanoi:
         hanoi = self.hanoi
         step = -1
         winning_steps: List[int] = []
-        moves_len = len(self.moves)
         moves_list = list(map(lambda x: int(x) + 1, self.moves))  # shift the moves by 1 and make it a list of ints
         stop_condition = self.disks  # all the disks on a single rod (except from disk "1")
-        winning_moves = set()  # store all indices of the moves that belong to a winning states
+        start_state = deepcopy(hanoi), self._disk_1_location  # the state at move index 0
 
         while True:
+            # if we are back at the starting state (at move index 0) the cycle is closed, so we can stop
+            if step >= 0 and (hanoi, self._disk_1_location) == start_state:
+                return {
+                    "period": step + 1,
+                    "phases": winning_steps
+                }
+
             for move in moves_list:
                 step += 1
 
                 # if all disks are located in rod "1" we found a winning state
                 if len(hanoi[1]) == stop_condition and self._disk_1_location == 1:
-                    r = step % moves_len  # the index of the current move in the moves string
-
-                    # if r is in winning_moves we are starting a new winning cycle, so we can stop
-                    if r in winning_moves:
-                        return {
-                            "period": step - winning_steps[0],
-                            "phases": winning_steps
-                        }
-
-                    winning_moves.add(r)
                     winning_steps.append(step)
 
                 # dealing with the case: "Take a disk which is not "1" and move it to another rod"
@@ -158,6 +168,272 @@ class Hanoi:
                     self._disk_1_location = (self._disk_1_location + move) % 3
 
 
+class CompactHanoi:
+    """
+    A Hanoi tower encoded as integers: each rod is a bitmask of the disks on it (bit d is set if disk d is on the rod).
+    Disk "1" is kept apart, as the index of its rod.
+
+    The top disk of a rod is its lowest set bit, so moving a disk which is not "1" takes a few bit operations,
+    and a winning state is a single comparison of the middle rod with the mask of all the disks.
+    """
+
+    __slots__ = ("disks", "moves", "rods", "_disk_1_location", "_winning_steps")
+
+    def __init__(self, n: int, moves: str):
+        self.disks: int = n
+        self.moves: str = moves
+        self.rods: List[int] = self.build_rods(n)
+        self._disk_1_location: int = 0
+        self._winning_steps: WinningSteps = {}
+
+    @staticmethod
+    def build_rods(n: int) -> List[int]:
+        """
+        Build the initial Hanoi tower, all the disks except from disk "1" (bits 2..n) are on the first rod
+        """
+
+        return [(1 << (n + 1)) - 4, 0, 0]
+
+    @property
+    def hanoi(self) -> HanoiTower:
+        """
+        The Hanoi tower in the representation of 'Hanoi' (used for printing)
+        """
+
+        return {
+            rod: [float("inf")] + [disk for disk in range(self.disks, 1, -1) if mask >> disk & 1]
+            for rod, mask in enumerate(self.rods)
+        }
+
+    print_hanoi = Hanoi.print_hanoi
+
+    def reset(self) -> None:
+        """
+        Reset the Hanoi tower to default values
+        """
+
+        self.rods = self.build_rods(self.disks)
+        self._winning_steps = {}
+        self._disk_1_location = 0
+
+    @property
+    def winning_steps(self):
+        """
+        Return the winning steps of the Hanoi tower.
+        If the _winning_steps variable is empty, it calculates it and sets it.
+        """
+
+        if not self._winning_steps:
+            self._winning_steps = self._find_winning_steps()
+
+        return self._winning_steps
+
+    def _find_winning_steps(self) -> WinningSteps:
+        """
+        Find all the winning steps of a game, the same way as 'Hanoi._find_winning_steps'.
+
+        The disks which are not "1" move only on move "2", so between two such moves the rods don't change,
+        and disk "1" moves by the sum of the moves between them (precomputed for every run of moves).
+        Only when the middle rod holds all the disks, the steps of the run are checked one by one for a win.
+
+        The cycle is detected on the full state of the game, like 'Hanoi._find_winning_steps', by comparing
+        the state at the start of a reference run with its state when we first reached it.
+        """
+
+        rods = self.rods
+        disk_1 = self._disk_1_location
+        step = 0
+        winning_steps: List[int] = []
+        moves_len = len(self.moves)
+        moves_list = [int(move) + 1 for move in self.moves]  # shift the moves by 1
+        full = (1 << (self.disks + 1)) - 4  # all the disks on a single rod (except from disk "1")
+
+        if 3 not in moves_list:
+            # Without move "2" there are no runs, and only disk "1" moves, so simulate it move by move
+            return Hanoi(self.disks, self.moves).winning_steps
+
+        # runs[i] - the run of moves of disk "1" starting at move i: its length and the total shift of disk "1",
+        # for move 0 and for the moves after every move "2" (the runs end at the next move "2")
+        runs: Dict[int, Tuple[int, int]] = {}
+
+        for i in [0] + [(j + 1) % moves_len for j, move in enumerate(moves_list) if move == 3]:
+            length = shift = 0
+
+            while moves_list[(i + length) % moves_len] != 3:
+                shift += moves_list[(i + length) % moves_len]
+                length += 1
+
+            runs[i] = length, shift % 3
+
+        r = 0  # the index of the current move in the moves string
+        # The reference run starts after the first move "2", we reach it in every cycle of the moves string
+        ref_r = (moves_list.index(3) + 1) % moves_len
+        ref_step = -1
+        ref_state = None
+
+        try:
+            while True:
+                if r == ref_r:
+                    if ref_state is None:
+                        ref_step = step
+                        ref_state = tuple(rods), disk_1
+
+                    # if we are back at the reference state the cycle is closed, so we can stop
+                    elif (tuple(rods), disk_1) == ref_state:
+                        period = step - ref_step
+
+                        # The states form a pure cycle, so every winning step repeats from its first cycle
+                        return {
+                            "period": period,
+                            "phases": sorted({win % period for win in winning_steps})
+                        }
+
+                length, shift = runs[r]
+
+                # if all disks are located in rod "1", we check the steps of the run for a winning state
+                if rods[1] == full:
+                    location = disk_1
+
+                    for i in range(length + 1):
+                        if location == 1:
+                            winning_steps.append(step + i)
+
+                        # the last move of the run is move "2", which doesn't move disk "1" (3 % 3 == 0)
+                        location = (location + moves_list[(r + i) % moves_len]) % 3
+
+                disk_1 = (disk_1 + shift) % 3
+                step += length + 1
+                r = (r + length + 1) % moves_len
+
+                # dealing with the case: "Take a disk which is not "1" and move it to another rod"
+                rod1_idx = (disk_1 + 1) % 3
+                rod2_idx = (disk_1 + 2) % 3
+
+                rod1 = rods[rod1_idx]
+                rod2 = rods[rod2_idx]
+
+                # The top disks (lowest set bits), an empty rod has no top disk (0)
+                top1 = rod1 & -rod1
+                top2 = rod2 & -rod2
+
+                # move the smaller top disk to the other rod
+                if top1 and (top1 < top2 or not top2):
+                    rods[rod1_idx] = rod1 ^ top1
+                    rods[rod2_idx] = rod2 | top1
+
+                elif top2:
+                    rods[rod1_idx] = rod1 | top2
+                    rods[rod2_idx] = rod2 ^ top2
+
+        finally:
+            self._disk_1_location = disk_1
+
+
+class TableHanoi(CompactHanoi):
+    """
+    A Hanoi tower which finds its winning steps from the transition table of a whole pass over the moves string.
+
+    A state of the game is the rod of every disk, 3^n states in total, and a state is indexed by
+    'config * 3 + disk_1', where 'config' has digit d - 2 (base 3) for the rod of disk d.
+    A pass over the moves string maps every state to the state after the pass (a permutation of the states),
+    so the period is the length of the starting state's cycle under this map (times the moves length).
+    """
+
+    __slots__ = ()
+
+    def _find_winning_steps(self) -> WinningSteps:
+        """
+        Find all the winning steps of a game, the same way as 'Hanoi._find_winning_steps'.
+
+        All the states are simulated together in numpy for a single pass over the moves string.
+        At every move index exactly one state of the pass start reaches the winning state, since every prefix
+        of the pass is a permutation too. The cycle of the starting state is followed by doubling:
+        the next states of the cycle are found by applying the map of the states found so far, and the map is squared,
+        so the cycle takes a logarithmic number of numpy operations instead of a step per move.
+        Above MAX_TABLE_DISKS the states don't fit in memory, and the game is simulated like 'CompactHanoi'.
+        """
+
+        if self.disks > MAX_TABLE_DISKS:
+            return super()._find_winning_steps()
+
+        n = self.disks
+        moves_len = len(self.moves)
+        states = 3 ** n
+        full = (1 << (n + 1)) - 4  # all the disks on a single rod (except from disk "1")
+        powers = [3 ** (disk - 2) for disk in range(2, n + 1)]  # the digit of every disk in 'config'
+
+        # Decode every state to its rods (bitmasks, like 'CompactHanoi') and disk "1" location
+        idx = np.arange(states, dtype=np.int64)
+        disk_1 = idx % 3
+        rods = np.zeros((3, states), dtype=np.int64)
+
+        for disk, power in zip(range(2, n + 1), powers):
+            rods[(idx // 3 // power) % 3, idx] |= 1 << disk
+
+        # win_starts[i] - the state at the start of the pass which is in the winning state after i moves
+        win_starts = np.zeros(moves_len, dtype=np.int64)
+
+        for i, move in enumerate(int(move) + 1 for move in self.moves):  # shift the moves by 1
+            win_starts[i] = np.flatnonzero((rods[1] == full) & (disk_1 == 1))[0]
+
+            if move == 3:
+                # dealing with the case: "Take a disk which is not "1" and move it to another rod"
+                rod1_idx = (disk_1 + 1) % 3
+                rod2_idx = (disk_1 + 2) % 3
+                rod1 = rods[rod1_idx, idx]
+                rod2 = rods[rod2_idx, idx]
+
+                # The top disks (lowest set bits), an empty rod has no top disk (0)
+                top1 = rod1 & -rod1
+                top2 = rod2 & -rod2
+
+                # move the smaller top disk to the other rod, toggling its bit on both rods
+                moved = np.where((top1 != 0) & ((top1 < top2) | (top2 == 0)), top1, top2)
+                rods[rod1_idx, idx] = rod1 ^ moved
+                rods[rod2_idx, idx] = rod2 ^ moved
+            else:
+                disk_1 = (disk_1 + move) % 3
+
+        # Encode the states after the pass back to indices
+        config = np.zeros(states, dtype=np.int64)
+
+        for disk, power in zip(range(2, n + 1), powers):
+            config += power * np.where(rods[1] >> disk & 1, 1, np.where(rods[2] >> disk & 1, 2, 0))
+
+        transition = config * 3 + disk_1
+        start = sum(power * next(rod for rod in range(3) if self.rods[rod] >> disk & 1)
+                    for disk, power in zip(range(2, n + 1), powers)) * 3 + self._disk_1_location
+
+        # cycle[j] is the state after j passes, 'jump' maps a state to the state len(cycle) passes after it
+        cycle = np.array([start], dtype=np.int64)
+        jump = transition
+
+        while True:
+            following = jump[cycle]
+
+            if (back := np.flatnonzero(following == start)).size:
+                cycle = np.concatenate([cycle, following[:back[0]]])
+                break
+
+            cycle = np.concatenate([cycle, following])
+            jump = jump[jump]
+
+        # The pass of every state of the cycle, the states which are not in the cycle never win
+        passes = np.full(states, -1, dtype=np.int64)
+        passes[cycle] = np.arange(len(cycle))
+        win_passes = passes[win_starts]
+        win_moves = np.flatnonzero(win_passes >= 0)
+
+        return {
+            "period": len(cycle) * moves_len,
+            "phases": sorted((win_passes[win_moves] * moves_len + win_moves).tolist())
+        }
+
+
+ENGINES = {"lists": Hanoi, "compact": CompactHanoi, "table": TableHanoi}  # the Hanoi tower implementations
+BATCH_ENGINES = {"lockstep": find_winning_steps_many}  # the implementations that simulate many games at once
+
+
 def combine_phased_rotations(
     a_period: int, a_phase: int, b_period: int, b_phase: int
 ) -> Tuple[int, int] | None:
@@ -222,44 +498,221 @@ def find_synced_wins(
     The result is:
     [(period1, phase1), (period2, phase2), (period3, phase3), ...]
 
+    Two winning steps have synced wins only when their phases agree modulo the gcd of their periods,
+    so the winning steps of the second game are bucketed by their phase modulo the gcd,
+    and each winning step of the first game is combined only with its matching bucket.
+    Equivalent synced wins (the same period and phase) are kept once.
+
+    """
+
+    res = set()
+
+    # All the winning steps of a game share the same period, so there are only a few groups
+    groups1 = defaultdict(list)
+    groups2 = defaultdict(list)
+
+    for period, phase in winning_steps1:
+        groups1[period].append(phase)
+
+    for period, phase in winning_steps2:
+        groups2[period].append(phase)
+
+    for period1, phases1 in groups1.items():
+        for period2, phases2 in groups2.items():
+            gcd = math.gcd(period1, period2)
+            buckets = defaultdict(list)
+
+            for phase2 in phases2:
+                buckets[phase2 % gcd].append(phase2)
+
+            for phase1 in phases1:
+                for phase2 in buckets.get(phase1 % gcd, ()):
+                    if period_phase := combine_phased_rotations(period1, phase1, period2, phase2):
+                        res.add(period_phase)
+
+                    # Alternatively, we can use the crt (chinese remainder theorem) function from the sympy package
+                    # to obtain the combined period and phase
+                    # if phase_period := crt([period2, period1], [phase2, phase1]):
+                    #     res.add((phase_period[1], phase_period[0]))
+
+    return sorted(res)
+
+
+def get_winning_steps(game: Dict[str, Any], engine: str = "compact") -> WinningSteps:
+    """
+    Simulate a single game with the Hanoi tower implementation 'engine' and return its winning steps
+    """
+
+    if engine in BATCH_ENGINES:
+        return BATCH_ENGINES[engine]([game])[0]
+
+    return ENGINES[engine](**game).winning_steps
+
+
+def to_general_wins(wins: WinningSteps) -> List[GeneralWin]:
+    """
+    Create a list of winning steps, e.g.: [(period1, phase1), (period2, phase2), ...]
+    """
+
+    phases = wins["phases"]
+    periods = [wins["period"]] * len(phases)
+
+    return list(zip(periods, phases))
+
+
+def iter_winning_steps(
+        games: List[Dict[str, Any]],
+        engine: str = "compact",
+        workers: int = 1,
+        executor: ProcessPoolExecutor | None = None,
+) -> Iterator[Tuple[Dict[str, Any], WinningSteps]]:
+    """
+    Simulate the games and yield each game with its winning steps.
+
+    With more than one worker (or with an executor), the games are simulated in a process pool and yielded
+    as soon as their simulation ends. Closing the generator cancels the simulations that didn't start.
+    A pool that was passed as 'executor' is kept running, so it can be reused by the caller.
+    A batch engine (one of BATCH_ENGINES) simulates all the games together in this process.
     """
 
-    res = []
+    if engine in BATCH_ENGINES:
+        yield from zip(games, BATCH_ENGINES[engine](games))
+        return
+
+    if workers <= 1 and executor is None:
+        for game in games:
+            yield game, get_winning_steps(game, engine)
+
+        return
+
+    pool = executor or ProcessPoolExecutor(workers)
+    futures = {}
 
-    for period1, phase1 in winning_steps1:
-        for period2, phase2 in winning_steps2:
-            if period_phase := combine_phased_rotations(period1, phase1, period2, phase2):
-                res.append(period_phase)
+    try:
+        futures = {pool.submit(get_winning_steps, game, engine): game for game in games}
 
-            # Alternatively, we can use the crt (chinese remainder theorem) function from the sympy package
-            # to obtain the combined period and phase
-            # if phase_period := crt([period2, period1], [phase2, phase1]):
-            #     res.append((phase_period[1], phase_period[0]))
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
-    return res
+    finally:
+        if executor is None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in futures:
+                future.cancel()
 
 
-def min_synced_winning_step(games) -> int:
+def min_synced_winning_step(
+        games,
+        engine: str = "compact",
+        workers: int = 1,
+        cache: WinsCache | None = None,
+        executor: ProcessPoolExecutor | None = None,
+) -> int:
     """
     The function receive a list of games and return the minimal number of steps.
     at which all games reach a winning state at the same time.
     If no such step exists, return -1.
+    The games are simulated with the Hanoi tower implementation 'engine' (one of ENGINES or BATCH_ENGINES).
+
+    With more than one worker, the games are simulated in a process pool, and the winning steps of each game
+    are merged as soon as its simulation ends (the merge doesn't depend on the order of the games).
+    Once no synced win is left, the simulations that didn't start are cancelled.
+    An existing pool can be passed as 'executor' instead of starting a new one.
+
+    A repeated game doesn't change the synced wins, so every (n, moves) is merged once.
+    With a cache, the cached games are merged first, and the winning steps of the simulated games are stored in it.
     """
 
     curr = [(1, 1)]
+    unique_games = {(game["n"], game["moves"]): game for game in games}
+    simulated = []
+
+    for (n, moves), game in unique_games.items():
+        if cache is not None and (wins := cache.get(n, moves)) is not None:
+            curr = find_synced_wins(to_general_wins(wins), curr)
+        else:
+            simulated.append(game)
+
+    if not curr:
+        return -1
+
+    results = iter_winning_steps(simulated, engine, workers, executor)
+
+    try:
+        for game, wins in results:
+            if cache is not None:
+                cache.put(game["n"], game["moves"], wins)
 
-    for game in games:
-        hanoi = Hanoi(**game)
-        wins = hanoi.winning_steps
+            curr = find_synced_wins(to_general_wins(wins), curr)
 
-        # Create a list of winning steps, e.g.: [(period1, phase1), (period2, phase2), ...]
-        phases = wins["phases"]
-        periods = [wins["period"]] * len(phases)
-        periods_phases = list(zip(periods, phases))
+            if not curr:
+                return -1
 
-        curr = find_synced_wins(periods_phases, curr)
+    finally:
+        results.close()
 
-    return -1 if not curr else min(curr, key=lambda x: x[1])[1]
+    return min(curr, key=lambda x: x[1])[1]
+
+
+def solve_batch(
+        lines: TextIO, out: TextIO, engine: str = "compact", workers: int = 1, cache: WinsCache | None = None
+) -> int:
+    """
+    Solve a stream of game sets, one JSON line per set: {"games": [{"n": ..., "moves": ...}, ...]}
+    (the format of the games files, an optional "id" is copied to the answer) or a bare list of games.
+    Each answer is written to 'out' as soon as it's found, as a JSON line:
+    {"id": ..., "line": 1, "solution": 16511310, "time": 0.01}
+
+    The sets are read one at a time, and the winning steps of the games are shared between the sets
+    through 'cache' (an in-memory cache if there is none), so a repeated game is simulated once.
+
+    :return: The number of sets that were solved
+    """
+
+    if cache is None:
+        cache = WinsCache()
+
+    # A single pool for all the sets, instead of starting one for every set
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    solved = 0
+
+    try:
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+
+            response: Dict[str, Any] = {"line": line_number}
+
+            try:
+                game_set = json.loads(line)
+
+                if isinstance(game_set, dict):
+                    if "id" in game_set:
+                        response = {"id": game_set["id"], **response}
+
+                    games = game_set["games"]
+                else:
+                    games = game_set
+
+                start = time()
+                response["solution"] = min_synced_winning_step(games, engine, workers, cache, executor)
+                response["time"] = time() - start
+                solved += 1
+
+            except KeyError as e:
+                response["error"] = f"missing key {e}"
+            except (ValueError, TypeError) as e:
+                response["error"] = str(e)
+
+            out.write(json.dumps(response) + "\n")
+            out.flush()
+
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return solved
 
 
 def parse_args() -> argparse.Namespace:
@@ -273,23 +726,80 @@ def parse_args() -> argparse.Namespace:
         dest="games",
         help="the input games file name",
     )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        default=None,
+        type=str,
+        dest="batch",
+        help="solve the game sets of this JSONL file ('-' for stdin), one set per line",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        default="compact",
+        choices=list(ENGINES) + list(BATCH_ENGINES),
+        dest="engine",
+        help="the Hanoi tower implementation",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        default=1,
+        type=int,
+        dest="workers",
+        help="number of worker processes simulating the games",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        type=str,
+        dest="cache",
+        help="keep the winning steps of the games in this SQLite file between runs",
+    )
+    parser.add_argument(
+        "--cache-size",
+        default=MAX_ENTRIES,
+        type=int,
+        dest="cache_size",
+        help="number of games kept in the cache",
+    )
 
     return parser.parse_args()
 
 
 def main(args: argparse.Namespace):
+    cache = WinsCache(args.cache, args.cache_size) if args.cache else None
+
+    if args.batch:
+        try:
+            if args.batch == "-":
+                solve_batch(sys.stdin, sys.stdout, args.engine, args.workers, cache)
+            else:
+                with open(args.batch) as f:
+                    solve_batch(f, sys.stdout, args.engine, args.workers, cache)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        return
+
     games_file = f"games/{args.games}.json"
 
     with open(games_file) as f:
         games = json.load(f)["games"]
 
     start = time()
-    result = min_synced_winning_step(games)
+    result = min_synced_winning_step(games, args.engine, args.workers, cache)
     end = time()
 
     print(f"Solution: {result}")
     print(f"Total time = {end - start} seconds")
 
+    if cache is not None:
+        print(f"Cache hits = {cache.hits}, misses = {cache.misses}")
+        cache.close()
+
 
 if __name__ == "__main__":
     main(parse_args())
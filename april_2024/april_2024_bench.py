@@ -0,0 +1,283 @@
+"""
+IBM Ponder This - April 2024 Challenge - Benchmark
+
+Runs the solvers over the known game sets and over seeded random game sets, and writes the measurements as JSON
+so runs can be diffed. The simulation of the games and the merge of their winning steps are timed separately.
+
+The known game sets are checked against their known solutions, and the random game sets are checked against
+the solution of the 'compact' engine. The steps/sec of every solver is the sum of the periods of the games
+(the steps of their cycles) over its simulation time, so the solvers are compared on the same steps.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+import april_2024_naive
+from april_2024 import BATCH_ENGINES, ENGINES, find_synced_wins, get_winning_steps, to_general_wins
+
+# Known solutions (from the module docstring of april_2024.py)
+KNOWN_SOLUTIONS = {
+    "challenge": 16511310,
+    "bonus": 1169723214,
+}
+REFERENCE_ENGINE = "compact"  # the engine the solutions of the random game sets are checked against
+
+SOLVERS = list(ENGINES) + list(BATCH_ENGINES) + ["naive"]
+DEFAULT_SOLVERS = list(ENGINES)  # the batch engines and the naive solver are slow on small game sets
+MAX_RANDOM_TRIES = 10000  # number of random games tried for every game of a random game set
+
+
+def random_games(rng: random.Random, n: int, moves_length: int, count: int) -> List[Dict[str, Any]]:
+    """
+    Generate a solvable set of random games with n disks and moves strings of length 'moves_length'.
+    Every moves string has at least one move "2", so the disks which are not "1" move.
+
+    Most random games never win, and most pairs of winning games never win together,
+    so a game is kept only if it wins together with the games kept before it (by the 'compact' engine).
+    """
+
+    games: List[Dict[str, Any]] = []
+    curr = [(1, 1)]
+
+    for _ in range(count):
+        for _ in range(MAX_RANDOM_TRIES):
+            moves = [rng.choice("012") for _ in range(moves_length)]
+            moves[rng.randrange(moves_length)] = "2"
+            game = {"n": n, "moves": "".join(moves)}
+            synced_wins = find_synced_wins(to_general_wins(get_winning_steps(game, REFERENCE_ENGINE)), curr)
+
+            if synced_wins:
+                games.append(game)
+                curr = synced_wins
+                break
+        else:
+            raise ValueError(f"No random game with n={n} and moves length {moves_length} wins with the others")
+
+    return games
+
+
+def run_engine(engine: str, games: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Solve a game set like 'min_synced_winning_step', timing the simulation and the merge of every game
+    """
+
+    sim_time = merge_time = 0.0
+    periods = 0
+    curr_sizes = []
+    curr = [(1, 1)]
+
+    start = time.perf_counter()
+
+    if engine in BATCH_ENGINES:
+        all_wins = BATCH_ENGINES[engine](games)
+    else:
+        all_wins = [get_winning_steps(game, engine) for game in games]
+
+    sim_time += time.perf_counter() - start
+
+    for wins in all_wins:
+        periods += wins["period"]
+
+        start = time.perf_counter()
+        curr = find_synced_wins(to_general_wins(wins), curr)
+        merge_time += time.perf_counter() - start
+
+        curr_sizes.append(len(curr))
+
+    return {
+        "solution": min(curr, key=lambda x: x[1])[1] if curr else -1,
+        "sim_time": sim_time,
+        "merge_time": merge_time,
+        "periods": periods,
+        "curr_sizes": curr_sizes,
+    }
+
+
+def run_naive(games: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Solve a game set with 'april_2024_naive'.
+    The games are simulated lazily by the intersection, so the simulation time includes the merge.
+    """
+
+    start = time.perf_counter()
+    solution = april_2024_naive.min_synced_winning_step(
+        [april_2024_naive.WinningStates(**game) for game in games]
+    )
+    sim_time = time.perf_counter() - start
+
+    return {
+        "solution": solution,
+        "sim_time": sim_time,
+        "merge_time": 0.0,
+        "curr_sizes": [],
+    }
+
+
+def get_game_sets(
+        known: List[str], disks: List[int], moves_lengths: List[int], counts: List[int], seed: int
+) -> List[Dict[str, Any]]:
+    """
+    The known game sets (read from the games directory) and a random game set for every combination of
+    the number of disks, the moves length and the number of games
+    """
+
+    game_sets = []
+
+    for name in known:
+        with open(f"games/{name}.json") as f:
+            game_sets.append({"name": name, "games": json.load(f)["games"], "expected": KNOWN_SOLUTIONS[name]})
+
+    rng = random.Random(seed)
+
+    for n in disks:
+        for moves_length in moves_lengths:
+            for count in counts:
+                game_sets.append({
+                    "name": f"random-n{n}-m{moves_length}-g{count}",
+                    "games": random_games(rng, n, moves_length, count),
+                    "expected": None,
+                })
+
+    return game_sets
+
+
+def run_benchmark(solvers: List[str], game_sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run every solver on every game set.
+    The steps of a game set are the sum of the periods of its games, for every solver.
+    """
+
+    cases = []
+
+    for game_set in game_sets:
+        reference = run_engine(REFERENCE_ENGINE, game_set["games"])
+        expected = game_set["expected"]
+
+        if expected is None:
+            expected = reference["solution"]
+
+        for solver in solvers:
+            if solver == "naive":
+                measurements = run_naive(game_set["games"])
+            else:
+                measurements = run_engine(solver, game_set["games"])
+                del measurements["periods"]
+
+            case = {
+                "solver": solver,
+                "game_set": game_set["name"],
+                "games": len(game_set["games"]),
+                "expected": expected,
+                "correct": measurements["solution"] == expected,
+                "steps": reference["periods"],
+                "steps_per_sec": reference["periods"] / max(measurements["sim_time"], 1e-9),
+                **measurements,
+            }
+            cases.append(case)
+
+            print(
+                f"{solver:>8} {game_set['name']:<24} sim={case['sim_time']:.3f}s merge={case['merge_time']:.3f}s "
+                f"steps/sec={case['steps_per_sec']:.3g} {'OK' if case['correct'] else 'WRONG'}",
+                file=sys.stderr,
+            )
+
+    return cases
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-s",
+        "--solvers",
+        default=DEFAULT_SOLVERS,
+        nargs="+",
+        choices=SOLVERS,
+        dest="solvers",
+        help="the solvers to benchmark (default: the single game engines of april_2024)",
+    )
+    parser.add_argument(
+        "-g",
+        "--games",
+        default=list(KNOWN_SOLUTIONS),
+        nargs="*",
+        choices=list(KNOWN_SOLUTIONS),
+        dest="games",
+        help="the known game sets",
+    )
+    parser.add_argument(
+        "--disks",
+        default=[6, 9],
+        nargs="*",
+        type=int,
+        dest="disks",
+        help="the numbers of disks of the random game sets",
+    )
+    parser.add_argument(
+        "--moves-lengths",
+        default=[20, 100],
+        nargs="+",
+        type=int,
+        dest="moves_lengths",
+        help="the moves lengths of the random game sets",
+    )
+    parser.add_argument(
+        "--counts",
+        default=[4],
+        nargs="+",
+        type=int,
+        dest="counts",
+        help="the numbers of games in the random game sets",
+    )
+    parser.add_argument(
+        "--seed",
+        default=2024,
+        type=int,
+        dest="seed",
+        help="the seed of the random game sets",
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        default=None,
+        type=str,
+        dest="out",
+        help="write the JSON results to this file (default: stdout)",
+    )
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace):
+    game_sets = get_game_sets(args.games, args.disks, args.moves_lengths, args.counts, args.seed)
+    cases = run_benchmark(args.solvers, game_sets)
+
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "cases": cases,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    # A failing exit code, so a wrong answer won't pass unnoticed
+    if not all(case["correct"] for case in cases):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(parse_args())
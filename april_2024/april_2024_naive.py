@@ -11,8 +11,9 @@ Bonus:
 import argparse
 import json
 from copy import deepcopy
+from math import lcm
 from time import time
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 Hanoi = Dict[int, List[Any]]
 
@@ -57,86 +58,130 @@ def build_hanoi(n: int) -> Hanoi:
     return rods
 
 
-def find_winning_states(n: int, moves: str, number_of_wins: int = 10000) -> List[int]:
+class WinningStates:
     """
-    Finds winning states steps by moving the disks in the Hanoi tower according to the provided
-    moves sequence until we find a win. 'number_of_wins' is the stop condition of the function,
-    we return the found winning states steps only when we find 'number_of_wins' wins.
+    The winning states steps of a game, yielded one win at a time (in increasing order),
+    for as long as the caller asks for more wins.
 
-    At any point we can call the function 'print_hanoi(hanoi)', to print the current Hanoi tower for debug purposes.
+    The disks are moved in the Hanoi tower according to the provided moves sequence. The game is a cycle
+    which returns to the initial Hanoi tower, and the step of that return is the period of the game
+    (None until the simulation reaches it). If a whole cycle passed without a win, the game never wins
+    and the iteration ends.
 
-    :param n: Number of disks in the Hanoi tower
-    :param moves: The movement sequence of the disks
-    :param number_of_wins: Number of wins we want to find before exiting the function
-    :return: A list of length 'number_of_wins' with all the states that considered wins
+    At any point we can call the function 'print_hanoi(hanoi)', to print the current Hanoi tower for debug purposes.
     """
 
-    hanoi = build_hanoi(n)
-    disk_one = 0
-    step = -1
-    wins = []
+    def __init__(self, n: int, moves: str):
+        """
+        :param n: Number of disks in the Hanoi tower
+        :param moves: The movement sequence of the disks
+        """
+
+        self.period: int | None = None
+        self._steps: Iterator[int] = self._simulate(n, moves)
+
+    def __iter__(self) -> Iterator[int]:
+        return self
+
+    def __next__(self) -> int:
+        return next(self._steps)
+
+    def _simulate(self, n: int, moves: str) -> Iterator[int]:
+        hanoi = build_hanoi(n)
+        initial_hanoi = build_hanoi(n)
+        disk_one = 0
+        step = -1
+        won = False
+
+        while True:
+            # back at the initial Hanoi tower at the start of the moves, a whole cycle passed
+            if self.period is None and step >= 0 and hanoi == initial_hanoi:
+                self.period = step + 1
+
+                if not won:
+                    return
 
-    while True:
-        for c in moves:
-            step += 1
+            for c in moves:
+                step += 1
 
-            # if all disks are located in rod "1" we found a winning state
-            if len(hanoi[0]) == 1 and len(hanoi[2]) == 1:
-                wins.append(step)
-                if len(wins) == number_of_wins:
-                    return wins
+                # if all disks are located in rod "1" we found a winning state
+                if len(hanoi[0]) == 1 and len(hanoi[2]) == 1:
+                    won = True
+                    yield step
 
-            # update the location of disk "1"
-            if c == "0":
-                hanoi[disk_one].pop()
-                new_rod = (disk_one + 1) % 3
-                hanoi[new_rod].append(1)
-                disk_one = new_rod
+                # update the location of disk "1"
+                if c == "0":
+                    hanoi[disk_one].pop()
+                    new_rod = (disk_one + 1) % 3
+                    hanoi[new_rod].append(1)
+                    disk_one = new_rod
 
-            # update the location of disk "1"
-            elif c == "1":
-                hanoi[disk_one].pop()
-                new_rod = (disk_one + 2) % 3
-                hanoi[new_rod].append(1)
-                disk_one = new_rod
+                # update the location of disk "1"
+                elif c == "1":
+                    hanoi[disk_one].pop()
+                    new_rod = (disk_one + 2) % 3
+                    hanoi[new_rod].append(1)
+                    disk_one = new_rod
 
-            # dealing with the case: "Take a disk which is not "1" and move it to another rod"
-            else:
-                rod1_idx = (disk_one + 1) % 3
-                rod2_idx = (disk_one + 2) % 3
+                # dealing with the case: "Take a disk which is not "1" and move it to another rod"
+                else:
+                    rod1_idx = (disk_one + 1) % 3
+                    rod2_idx = (disk_one + 2) % 3
 
-                rod1 = hanoi[rod1_idx]
-                rod2 = hanoi[rod2_idx]
+                    rod1 = hanoi[rod1_idx]
+                    rod2 = hanoi[rod2_idx]
 
-                # determine which disk to move
-                if rod1[-1] > rod2[-1]:
-                    rod1.append(rod2.pop())
+                    # determine which disk to move
+                    if rod1[-1] > rod2[-1]:
+                        rod1.append(rod2.pop())
 
-                elif rod1[-1] < rod2[-1]:
-                    rod2.append(rod1.pop())
+                    elif rod1[-1] < rod2[-1]:
+                        rod2.append(rod1.pop())
 
 
-def min_synced_winning_step(winning_states_all: List[List[int]]) -> int:
+def min_synced_winning_step(winning_states_all: List[Iterator[int]]) -> int:
     """
     Find the minimal number of steps at which all games reach a winning state at the same time.
 
-    :param winning_states_all: List of lists. Each list contains the steps required to reach a winning state of each game.
+    The winning states of the games are intersected lazily (a k-way intersection of increasing sequences):
+    every game behind the latest win is advanced until it reaches it, and once all the games
+    are at the same step it's the minimal synced winning step. Only the current win of every game is kept,
+    so there is no limit on the number of wins before the synced win.
+    The wins of a game repeat every period, so once the periods of all the games are known (see 'WinningStates'),
+    a synced win exists only below their lcm, and the search stops there.
+
+    :param winning_states_all: List of iterators. Each iterator yields the winning states steps of a game,
+                               in increasing order (e.g. 'WinningStates').
     :return: The minimal number of steps at which all games reach a winning state at the same time.
              If no such step exists, return -1.
     """
 
-    min_step = -1
-    synced_wins = set(winning_states_all[0])
-
-    for winning_states in winning_states_all[1:]:
-        synced_wins &= set(winning_states)
+    cycle = None  # the lcm of the periods of all the games, once they are known
 
     try:
-        min_step = min(synced_wins)
-    except ValueError:
-        print("Minimal synced winning state step not found, try increasing the value of 'number_of_wins'")
+        current = [next(winning_states) for winning_states in winning_states_all]
+
+        while True:
+            max_step = max(current)
+
+            if all(step == max_step for step in current):
+                return max_step
+
+            if cycle is None:
+                periods = [getattr(winning_states, "period", None) for winning_states in winning_states_all]
+
+                if None not in periods:
+                    cycle = lcm(*periods)
+
+            if cycle is not None and max_step >= cycle:
+                return -1
+
+            for i, winning_states in enumerate(winning_states_all):
+                while current[i] < max_step:
+                    current[i] = next(winning_states)
 
-    return min_step
+    except StopIteration:
+        return -1
 
 
 def parse_args() -> argparse.Namespace:
@@ -162,7 +207,7 @@ def main(args: argparse.Namespace):
 
     start = time()
 
-    winning_states_all = [find_winning_states(**game) for game in games]
+    winning_states_all = [WinningStates(**game) for game in games]
     result = min_synced_winning_step(winning_states_all)
 
     end = time()
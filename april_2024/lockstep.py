@@ -0,0 +1,100 @@
+"""
+A numpy Hanoi engine for the April 2024 challenge, which simulates many games at once.
+
+The states of all the games are kept in numpy arrays (a lane per game), and every iteration advances all the lanes
+by a single move, each lane reading the move of its own moves string. The winning states and the ends of the cycles
+are detected per lane with masks, so the interpreter overhead of a step is shared by all the games.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+WinningSteps = Dict[str, Any]
+
+
+def find_winning_steps_many(games: List[Dict[str, Any]]) -> List[WinningSteps]:
+    """
+    Find the winning steps of many games, the same way as 'Hanoi._find_winning_steps'.
+
+    Like 'CompactHanoi', each rod is a bitmask of the disks which are not "1" (disk d is bit d),
+    so rods[g, r] is rod r of game g, and the top disk of a rod is its lowest set bit.
+    All the games advance together, whatever their number of disks, and a game ends when it returns
+    to its starting state at move index 0 (the states of a game form a pure cycle).
+
+    :param games: The games, each a dictionary with the keys: n, moves
+    :return: The winning steps of every game ({"period": ..., "phases": [...]}), in the order of 'games'
+    """
+
+    if not games:
+        return []
+
+    lengths = np.array([len(game["moves"]) for game in games], dtype=np.int64)
+    # moves[g, i] is move i of game g shifted by 1, padded with the first move (never read)
+    moves = np.array(
+        [[int(move) + 1 for move in game["moves"].ljust(lengths.max(), game["moves"][0])] for game in games],
+        dtype=np.int64,
+    )
+    # all the disks on a single rod (except from disk "1")
+    full = np.array([(1 << (game["n"] + 1)) - 4 for game in games], dtype=np.int64)
+
+    rods = np.zeros((len(games), 3), dtype=np.int64)
+    rods[:, 0] = full
+    disk_1 = np.zeros(len(games), dtype=np.int64)
+
+    lane_ids = np.arange(len(games))  # the game of every lane
+    lanes = np.arange(len(games))
+    winning_steps: List[List[int]] = [[] for _ in games]
+    periods = [0] * len(games)
+    step = 0
+
+    while True:
+        move_idx = step % lengths
+
+        if step:
+            # the lanes back at their starting state at move index 0 closed their cycle
+            done = (move_idx == 0) & (rods[:, 0] == full) & (disk_1 == 0)
+
+            if done.any():
+                for lane in lane_ids[done]:
+                    periods[lane] = step
+
+                keep = ~done
+
+                if not keep.any():
+                    break
+
+                lane_ids, lengths, moves, full, rods, disk_1, move_idx = (
+                    lane_ids[keep], lengths[keep], moves[keep], full[keep], rods[keep], disk_1[keep], move_idx[keep]
+                )
+                lanes = np.arange(len(lane_ids))
+
+        # if all disks are located in rod "1" we found a winning state
+        for lane in lane_ids[(rods[:, 1] == full) & (disk_1 == 1)]:
+            winning_steps[lane].append(step)
+
+        move = moves[lanes, move_idx]
+        other = move == 3
+
+        # dealing with the case: "Take a disk which is not "1" and move it to another rod"
+        rod1_idx = (disk_1 + 1) % 3
+        rod2_idx = (disk_1 + 2) % 3
+        rod1 = rods[lanes, rod1_idx]
+        rod2 = rods[lanes, rod2_idx]
+
+        # The top disks (lowest set bits), an empty rod has no top disk (0)
+        top1 = rod1 & -rod1
+        top2 = rod2 & -rod2
+
+        # move the smaller top disk to the other rod, toggling its bit on both rods
+        moved = np.where((top1 != 0) & ((top1 < top2) | (top2 == 0)), top1, top2)
+        moved[~other] = 0
+
+        rods[lanes, rod1_idx] = rod1 ^ moved
+        rods[lanes, rod2_idx] = rod2 ^ moved
+
+        # moves "0" and "1" move disk "1" (move "2" doesn't move it, 3 % 3 == 0)
+        disk_1 = (disk_1 + move) % 3
+        step += 1
+
+    return [{"period": period, "phases": phases} for period, phases in zip(periods, winning_steps)]
@@ -0,0 +1,124 @@
+"""
+A persistent cache of the winning steps of Hanoi games, used by the April 2024 solver.
+
+The winning steps of a game ({"period": ..., "phases": [...]}) depend only on its number of disks and its moves,
+so they are stored in an SQLite file under a hash of both. Every game is simulated once across runs,
+and a repeated game costs a lookup instead of a simulation.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+MAX_ENTRIES = 100000  # number of games kept in the cache, the least recently used games are evicted
+MEMO_ENTRIES = 4096  # number of games kept in memory on top of the file
+
+WinningSteps = Dict[str, Any]
+
+
+def game_key(n: int, moves: str) -> str:
+    """
+    The content address of a game: a hash of its number of disks and its moves
+    """
+
+    return hashlib.sha256(f"{n}:{moves}".encode()).hexdigest()
+
+
+class WinsCache:
+    """
+    The winning steps of games, keyed by (n, moves).
+
+    The games are stored in an SQLite file (or only in memory when there is no path), bounded to 'max_entries'
+    games with least recently used eviction. The most recently used games are also kept in an in-process
+    dictionary, so a game that repeats in the same run doesn't reach the file.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = MAX_ENTRIES):
+        self.path: str | None = path
+        self.max_entries: int = max_entries
+        self.memo: OrderedDict[str, WinningSteps] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self._db: sqlite3.Connection | None = None
+
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS wins "
+                "(key TEXT PRIMARY KEY, period INTEGER, phases TEXT, last_used INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS wins_last_used ON wins (last_used)")
+            self._db.commit()
+
+    def _remember(self, key: str, wins: WinningSteps) -> None:
+        self.memo[key] = wins
+        self.memo.move_to_end(key)
+
+        if len(self.memo) > min(MEMO_ENTRIES, self.max_entries):
+            self.memo.popitem(last=False)
+
+    def get(self, n: int, moves: str) -> WinningSteps | None:
+        """
+        The winning steps of a game, None if the game isn't in the cache
+        """
+
+        key = game_key(n, moves)
+
+        if key in self.memo:
+            self.hits += 1
+            self.memo.move_to_end(key)
+            return self.memo[key]
+
+        row = None
+
+        if self._db is not None:
+            row = self._db.execute("SELECT period, phases FROM wins WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._db.execute("UPDATE wins SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+        self._db.commit()
+
+        wins = {"period": row[0], "phases": json.loads(row[1])}
+        self._remember(key, wins)
+
+        return wins
+
+    def put(self, n: int, moves: str, wins: WinningSteps) -> None:
+        """
+        Store the winning steps of a game, evicting the least recently used games above 'max_entries'
+        """
+
+        key = game_key(n, moves)
+        self._remember(key, wins)
+
+        if self._db is None:
+            return
+
+        self._db.execute(
+            "INSERT OR REPLACE INTO wins VALUES (?, ?, ?, ?)",
+            (key, wins["period"], json.dumps(wins["phases"]), time.time_ns()),
+        )
+        self._db.execute(
+            "DELETE FROM wins WHERE key IN "
+            "(SELECT key FROM wins ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        if self._db is None:
+            return len(self.memo)
+
+        return self._db.execute("SELECT COUNT(*) FROM wins").fetchone()[0]
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,452 @@
+"""
+Bit-packed arrays of flags, used as the steps array of the March 2024 solvers.
+
+The flags are packed 8 per byte. The flags around the search position are also kept unpacked (a byte per flag)
+in a hot window, since the eliminations of the solvers land right ahead of the search, so an elimination
+is a single numpy scatter instead of a read-modify-write of bytes that several indices may share.
+"""
+
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+
+HOT_SIZE = 1 << 23  # number of flags around the search position kept unpacked (a byte per flag)
+
+_SET_BITS = np.array([1 << i for i in range(8)], dtype=np.uint8)
+_CLEAR_BITS = ~_SET_BITS
+
+
+class Bitmap:
+    """
+    An array of boolean flags packed 8 per byte, optionally backed by a memory-mapped file.
+
+    Supports the operations the solvers use on a numpy bool array:
+    bitmap[i], bitmap[indices] and bitmap[indices] = value
+    A scalar index out of range raises IndexError, array indices are not checked
+    (the solvers only pass indices inside the array).
+
+    The flags of the hot window [hot_start, hot_stop) are kept unpacked, and their packed bytes are stale
+    until the window is packed back (when it moves, on 'state' and on 'flush').
+    'find_next' and 'find_all' move the window to the search position when the search passes its middle,
+    so it covers at least hot_size / 2 flags ahead of the search. Flags outside the window are set in the
+    packed bytes with the unbuffered 'at' version.
+
+    'find_next' skips a run of cleared flags in numpy, instead of testing them one by one.
+    """
+
+    def __init__(self, size: int, value: bool = True, path: str | None = None, hot_size: int = HOT_SIZE):
+        self.size: int = size
+        self.path: str | None = path
+        # The window starts and ends on whole bytes (except at the end of the bitmap)
+        self.hot_size: int = max(hot_size + -hot_size % 8, 8)
+        self.hot_start: int = 0
+        self.hot_stop: int = 0
+        self.hot: np.ndarray = np.zeros(0, dtype=bool)
+        n_bytes = (size + 7) >> 3
+
+        if path is None:
+            self.bits: np.ndarray = np.empty(n_bytes, dtype=np.uint8)
+        else:
+            self.bits = np.memmap(path, dtype=np.uint8, mode="w+", shape=(n_bytes,))
+
+        self.fill(value)
+
+    def state(self) -> Dict[str, Any]:
+        """
+        The content of the bitmap, to save it (e.g. in a checkpoint)
+        """
+
+        self._pack_hot()
+
+        return {"size": self.size, "bits": self.bits}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], path: str | None = None) -> "Bitmap":
+        """
+        Create a bitmap from a saved state (the result of 'state')
+        """
+
+        bitmap = cls(int(state["size"]), path=path)
+        bitmap.bits[:] = state["bits"]
+
+        return bitmap
+
+    def __len__(self) -> int:
+        return self.size
+
+    def fill(self, value: bool) -> None:
+        """
+        Set all the flags to 'value'
+        """
+
+        self.bits[:] = 0xFF if value else 0
+        self.hot[:] = value
+
+    def grow(self, size: int, value: bool = True) -> None:
+        """
+        Grow the bitmap to 'size' flags, keeping the current flags. The new flags are set to 'value'.
+        A memory-mapped bitmap extends its backing file, otherwise the bytes are resized in place,
+        so the old bytes are released as soon as they are moved.
+        """
+
+        if size <= self.size:
+            return
+
+        self._pack_hot()
+        self.hot_start = self.hot_stop = 0
+        self.hot = np.zeros(0, dtype=bool)
+        n_bytes = (size + 7) >> 3
+
+        if isinstance(self.bits, np.memmap):
+            self.bits.flush()
+            del self.bits
+            os.truncate(self.path, n_bytes)
+            self.bits = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(n_bytes,))
+        else:
+            # The bytes are never shared (the bitmap hands them out only to be saved), so we skip the reference check
+            self.bits.resize(n_bytes, refcheck=False)
+
+        old_size = self.size
+        self.size = size
+        self.set_range(old_size, size, value)
+
+    def set_range(self, start: int, stop: int, value: bool) -> None:
+        """
+        Set the flags in the range [start, stop) to 'value'
+        """
+
+        if start >= stop:
+            return
+
+        hot_start = max(start, self.hot_start)
+        hot_stop = min(stop, self.hot_stop)
+
+        if hot_start < hot_stop:
+            self.hot[hot_start - self.hot_start:hot_stop - self.hot_start] = value
+
+        first_byte = start >> 3
+        last_byte = (stop - 1) >> 3
+        first_mask = (0xFF << (start & 7)) & 0xFF
+        last_mask = 0xFF >> (7 - ((stop - 1) & 7))
+
+        if first_byte == last_byte:
+            first_mask &= last_mask
+        else:
+            self.bits[first_byte + 1:last_byte] = 0xFF if value else 0
+            self._set_mask(last_byte, last_mask, value)
+
+        self._set_mask(first_byte, first_mask, value)
+
+    def _set_mask(self, byte: int, mask: int, value: bool) -> None:
+        if value:
+            self.bits[byte] |= mask
+        else:
+            self.bits[byte] &= ~mask & 0xFF
+
+    def _pack_hot(self) -> None:
+        """
+        Write the hot window back to the packed bytes
+        """
+
+        if self.hot_start < self.hot_stop:
+            self.bits[self.hot_start >> 3:(self.hot_stop + 7) >> 3] = np.packbits(self.hot, bitorder="little")
+
+    def _move_hot(self, start: int) -> None:
+        """
+        Move the hot window to start at 'start' (rounded down to a whole byte), if the search passed its middle
+        """
+
+        if self.hot_start <= start < self.hot_stop and (
+            start < self.hot_start + self.hot_size // 2 or self.hot_stop == self.size
+        ):
+            return
+
+        self._pack_hot()
+        self.hot_start = start & ~7
+        self.hot_stop = min(self.hot_start + self.hot_size, self.size)
+        self.hot = np.unpackbits(
+            self.bits[self.hot_start >> 3:(self.hot_stop + 7) >> 3], count=self.hot_stop - self.hot_start,
+            bitorder="little"
+        ).view(bool)
+
+    def _flags(self, start: int, stop: int) -> np.ndarray:
+        """
+        The flags in the range [start, stop), unpacked
+        """
+
+        if self.hot_start <= start and stop <= self.hot_stop:
+            return self.hot[start - self.hot_start:stop - self.hot_start]
+
+        first = start & ~7
+        flags = np.unpackbits(self.bits[first >> 3:(stop + 7) >> 3], bitorder="little").view(bool)
+        flags = flags[start - first:stop - first]
+
+        # The hot window holds the current flags of its range
+        hot_start = max(start, self.hot_start)
+        hot_stop = min(stop, self.hot_stop)
+
+        if hot_start < hot_stop:
+            flags[hot_start - start:hot_stop - start] = self.hot[hot_start - self.hot_start:hot_stop - self.hot_start]
+
+        return flags
+
+    def __getitem__(self, idx: int | np.ndarray) -> bool | np.ndarray:
+        if isinstance(idx, (int, np.integer)):
+            if not 0 <= idx < self.size:
+                raise IndexError(f"index {idx} is out of bounds for a bitmap of size {self.size}")
+
+            if self.hot_start <= idx < self.hot_stop:
+                return bool(self.hot[idx - self.hot_start])
+
+            return bool(self.bits[idx >> 3] & _SET_BITS[idx & 7])
+
+        idx = np.asarray(idx)
+        flags = (self.bits[idx >> 3] & _SET_BITS[idx & 7]) != 0
+        in_hot = (idx >= self.hot_start) & (idx < self.hot_stop)
+        flags[in_hot] = self.hot[idx[in_hot] - self.hot_start]
+
+        return flags
+
+    def __setitem__(self, idx: int | np.ndarray, value: bool) -> None:
+        if isinstance(idx, (int, np.integer)):
+            idx = np.array([idx])
+
+        if not len(idx):
+            return
+
+        rel_idx = idx - self.hot_start
+
+        if rel_idx.min() >= 0 and rel_idx.max() < len(self.hot):
+            # The common case, all the indices are in the hot window
+            self.hot[rel_idx] = value
+            return
+
+        in_hot = (rel_idx >= 0) & (rel_idx < len(self.hot))
+        self.hot[rel_idx[in_hot]] = value
+        idx = idx[~in_hot]
+
+        # Use the unbuffered 'at' version, several indices may share the same byte
+        if value:
+            np.bitwise_or.at(self.bits, idx >> 3, _SET_BITS[idx & 7])
+        else:
+            np.bitwise_and.at(self.bits, idx >> 3, _CLEAR_BITS[idx & 7])
+
+    def find_next(self, start: int, stop: int | None = None) -> int:
+        """
+        Find the first set flag at index >= start
+
+        :param start: The index to start the search from
+        :param stop: The index to stop the search at (None - the bitmap size)
+        :return: The index of the flag that was found, or 'stop' if there is no such flag
+        """
+
+        stop = self.size if stop is None else min(stop, self.size)
+
+        if start >= stop:
+            return stop
+
+        self._move_hot(start)
+
+        if self.hot[start - self.hot_start]:
+            return start
+
+        chunk = 512
+
+        # Search the following flags in growing chunks, most searches end in the first chunk
+        while (start := start + 1) < stop:
+            end = min(start + chunk, stop)
+
+            # A chunk doesn't cross the end of the hot window, so it is a view of the window or entirely packed
+            if start < self.hot_stop < end:
+                end = self.hot_stop
+
+            flags = self._flags(start, end)
+            found = int(flags.argmax())
+
+            if flags[found]:
+                return start + found
+
+            start = end - 1
+            chunk = min(2 * chunk, 1 << 20)
+
+        return stop
+
+    def find_all(self, start: int, count: int) -> np.ndarray:
+        """
+        Find the first 'count' set flags at indices >= start
+
+        :param start: The index to start the search from
+        :param count: The number of flags to find
+        :return: The indices of the flags that were found, fewer than 'count' if the bitmap ends before
+        """
+
+        found = []
+        total = 0
+        start = max(start, 0)
+        chunk = 8 * count
+
+        if start < self.size:
+            self._move_hot(start)
+
+        # Search the following flags in growing chunks, until enough flags were found
+        while total < count and start < self.size:
+            end = min(start + chunk, self.size)
+
+            if start < self.hot_stop < end:
+                end = self.hot_stop
+
+            flags = np.flatnonzero(self._flags(start, end))[:count - total] + start
+
+            found.append(flags)
+            total += len(flags)
+            start = end
+            chunk = min(2 * chunk, 1 << 22)
+
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def flush(self) -> None:
+        """
+        Write the hot window back to the packed bytes, and the bytes to the backing file (if there is one)
+        """
+
+        self._pack_hot()
+
+        if isinstance(self.bits, np.memmap):
+            self.bits.flush()
+
+
+class RingBitmap:
+    """
+    A window of 'size' flags over an unbounded range of indices [base, base + size), stored in a circular Bitmap.
+    Index i is stored at position i % size, all the flags start as set, and only clearing flags is supported.
+
+    The window slides forward as the search (find_next) moves forward: the positions of the indices
+    the search passed are reset and reused for the indices after the window end, so the flags ahead of the
+    search are kept. Flags cleared beyond the window end are kept in an overflow store,
+    and replayed when the window reaches them.
+    """
+
+    def __init__(self, size: int, path: str | None = None, base: int = 0):
+        self.size: int = size
+        self.base: int = base
+        # A power of two size maps an index to its position with a mask instead of a (slower) modulo
+        self._mask: int | None = size - 1 if size & (size - 1) == 0 else None
+        self.window: Bitmap = Bitmap(size, path=path)
+        self.overflow: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return self.size
+
+    def state(self) -> Dict[str, Any]:
+        """
+        The content of the bitmap, to save it (e.g. in a checkpoint)
+        """
+
+        overflow = np.concatenate(self.overflow) if self.overflow else np.zeros(0, dtype=np.int64)
+        return {**self.window.state(), "base": self.base, "overflow": overflow}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], path: str | None = None) -> "RingBitmap":
+        """
+        Create a bitmap from a saved state (the result of 'state')
+        """
+
+        bitmap = cls(int(state["size"]), path=path, base=int(state["base"]))
+        bitmap.window = Bitmap.from_state(state, path=path)
+
+        if len(state["overflow"]):
+            bitmap.overflow.append(np.asarray(state["overflow"]))
+
+        return bitmap
+
+    def flush(self) -> None:
+        """
+        Write the window to its backing file (if there is one)
+        """
+
+        self.window.flush()
+
+    def __setitem__(self, idx: np.ndarray, value: bool) -> None:
+        """
+        Clear the flags of 'idx'. The indices must be at or above the window start (e.g. eliminations
+        ahead of the current offset), they are not checked.
+        """
+
+        if value:
+            raise ValueError("RingBitmap supports only clearing flags")
+
+        if not len(idx):
+            return
+
+        if idx.max() < self.base + self.size:
+            # The common case, all the indices are inside the window
+            self.window[idx & self._mask if self._mask is not None else idx % self.size] = False
+        else:
+            in_window = idx < self.base + self.size
+            self.window[idx[in_window] % self.size] = False
+            self.overflow.append(idx[~in_window])
+
+    def advance(self, base: int) -> None:
+        """
+        Slide the window forward to start at 'base'.
+        The flags of the indices below 'base' are dropped, and their positions are reset
+        and reused for the new indices at the end of the window.
+        """
+
+        if base <= self.base:
+            return
+
+        recycled = min(base - self.base, self.size)
+        start = self.base % self.size
+        stop = start + recycled
+
+        self.window.set_range(start, min(stop, self.size), True)
+        self.window.set_range(0, stop - self.size, True)
+        self.base = base
+
+        # Replay the flags that were cleared beyond the previous window end
+        if self.overflow:
+            overflow = np.concatenate(self.overflow)
+            overflow = overflow[overflow >= base]
+            in_window = overflow < base + self.size
+
+            self.window[overflow[in_window] % self.size] = False
+            self.overflow = [overflow[~in_window]] if not in_window.all() else []
+
+    def find_next(self, start: int, advance: bool = True) -> int:
+        """
+        Find the first set flag at index >= start.
+        The search assumes all the indices below 'start' are done, so the window may slide up to 'start'.
+
+        :param start: The index to start the search from
+        :param advance: Whether to slide the window. Without sliding, the search ends at the window end.
+        :return: The index of the flag that was found, -1 if there is no such flag in the window (advance=False)
+        """
+
+        start = max(start, self.base)
+
+        while True:
+            # Keep half of the window ahead of the search, so most flags will be cleared inside the window
+            if advance and start - self.base >= self.size // 2:
+                self.advance(start)
+
+            if start >= self.base + self.size:
+                return -1
+
+            # The window starts at the position of 'base' and wraps around the end of the bitmap
+            pos = start % self.size
+            base_pos = self.base % self.size
+
+            if pos >= base_pos:
+                found = self.window.find_next(pos)
+
+                if found == self.size:
+                    found = self.window.find_next(0, base_pos) + self.size
+            else:
+                found = self.window.find_next(pos, base_pos)
+
+            if found - pos < self.base + self.size - start:
+                return start + found - pos
+
+            start = self.base + self.size
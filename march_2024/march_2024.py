@@ -9,11 +9,34 @@ Packages installed: numpy, gmpy2
 """
 
 import argparse
+import os
+import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from math import isqrt, prod
+from typing import Any, Dict, Iterator, List, TextIO, Tuple
 
 import numpy as np
 from gmpy2 import is_prime
 
+from bitmap import HOT_SIZE, Bitmap, RingBitmap
+from miller_rabin import is_prime_batch
+from prime_cache import PrimeCache
+
+PRIME_WINDOW_SIZE = 1 << 23  # number of offsets the prime window advances between slides (fastest of 2^22..2^25)
+PRIME_WINDOW_CHUNK = 16  # number of terms looked up together in the prime window at first
+SHARD_SIZE = 10000000  # number of offsets each worker scans in a single task
+CHECKPOINT_INTERVAL = 600  # seconds between two checkpoints of the search state
+WHEEL_PRIMES = (2, 3, 5, 7, 11)  # terms divisible by these primes are skipped without a primality check
+PRIMALITY_TESTS = ("sieve", "mr")  # a segmented sieve window, or a batched Miller-Rabin test
+MR_BATCH = 256  # number of offsets tested together by a single Miller-Rabin call
+MR_CHUNK = 48  # number of terms of each offset tested in a single Miller-Rabin call (the largest first)
+SHORT_BATCH = 1024  # number of offsets 'get_initial_short_seq' tests together
+SHORT_CHUNK = 16  # number of terms of each offset gathered at a time from the sieve (the largest first)
+MIN_STEPS_SIZE = 1 << 24  # the smallest steps array (number of offsets) the solvers start with
+MEMORY_BUDGET_FRACTION = 0.5  # the default memory budget, out of the available memory
+
 
 def get_primes_till_n(n: int) -> np.ndarray:
     sieve = np.ones(n + 1, dtype=bool)
@@ -27,13 +50,366 @@ def get_primes_till_n(n: int) -> np.ndarray:
     return sieve
 
 
-def get_initial_naive(n: int, start_term: int = 1) -> int:
+class PrimeWindow:
+    """
+    A window [low, high) of the number line, sieved with the segmented Sieve of Eratosthenes.
+
+    Each slide sieves the new window with the base primes up to sqrt(high).
+    The base primes are kept between slides and recomputed only when the window passes their square,
+    so primality inside the window is a single array lookup: sieve[(term - low) // 2]
+
+    The window keeps only its odd numbers (low is even, so sieve[i] is low + 2i + 1). A slide is bound by the memory
+    writes of crossing out the multiples, not by the loop over the base primes, so halving the sieve halves the slide.
+    """
+
+    def __init__(self, size: int):
+        self.size: int = size + size % 2
+        self.low: int = 0
+        self.high: int = 0
+        self.sieve: np.ndarray = np.zeros(0, dtype=bool)
+        self._base_primes: List[int] = []
+        self._base_limit: int = 0
+
+    def slide(self, low: int) -> None:
+        """
+        Move the window to [low, low + size) and sieve it, low is rounded down to an even number
+        """
+
+        low -= low % 2
+        high = low + self.size
+        limit = isqrt(high)
+
+        if limit > self._base_limit:
+            # Grow the base primes geometrically, so we won't recompute them on every slide
+            self._base_limit = max(limit, 2 * self._base_limit)
+            self._base_primes = np.flatnonzero(get_primes_till_n(self._base_limit)).tolist()
+
+        sieve = np.ones(self.size // 2, dtype=bool)
+
+        for p in self._base_primes[1:]:
+            if p > limit:
+                break
+
+            # The first odd multiple inside the window (multiples below p^2 were removed by smaller primes)
+            first = max(p * p, -(-low // p) * p)
+            first += p * (first % 2 == 0)
+            sieve[(first - low) // 2::p] = False
+
+        if low == 0:
+            sieve[0] = False  # 1 isn't a prime
+
+        self.sieve = sieve
+        self.low = low
+        self.high = high
+
+    def first_prime(self, terms: np.ndarray) -> int:
+        """
+        The index of the first prime of 'terms' (all inside the window), -1 if none.
+        The terms are looked up with array operations, in chunks of PRIME_WINDOW_CHUNK terms that double in size,
+        since the first prime is usually among the first few terms.
+        """
+
+        start = 0
+        chunk = PRIME_WINDOW_CHUNK
+
+        while start < len(terms):
+            curr_terms = terms[start:start + chunk]
+            is_prime_term = self.sieve[(curr_terms - self.low) >> 1] & (curr_terms & 1).astype(bool)
+
+            if self.low <= 2 < self.high:
+                is_prime_term |= curr_terms == 2
+
+            first = int(is_prime_term.argmax())
+
+            if is_prime_term[first]:
+                return start + first
+
+            start += chunk
+            chunk *= 2
+
+        return -1
+
+
+def count_checks(stats: Dict[str, int] | None, checks: int, offsets: int = 1) -> None:
+    """
+    Count tested offsets and their primality checks in 'stats', if given (used for benchmarking)
+    """
+
+    if stats is not None:
+        stats["tested_offsets"] = stats.get("tested_offsets", 0) + offsets
+        stats["primality_checks"] = stats.get("primality_checks", 0) + checks
+
+
+def get_largest_prime_terms(
+    candidates: List[np.ndarray], chunk: int = MR_CHUNK, stats: Dict[str, int] | None = None
+) -> List[int | None]:
+    """
+    Find the largest prime term of many candidate sequences, using batched Miller-Rabin calls.
+
+    The terms of all the candidates are tested together, 'chunk' terms of each candidate at a time.
+    Since the terms are sorted from the largest to the smallest, a candidate is tested further
+    only if its current chunk has no prime.
+
+    :param candidates: Arrays of terms, each sorted from the largest to the smallest
+    :param chunk: Number of terms of each candidate in a single Miller-Rabin call
+    :param stats: A dictionary to count the tested offsets and primality checks in
+    :return: The largest prime term of each candidate, None if it has no prime term
+    """
+
+    count_checks(stats, 0, len(candidates))
+
+    res: List[int | None] = [None] * len(candidates)
+    pending = list(range(len(candidates)))
+    start = 0
+
+    while pending:
+        chunks = [candidates[i][start:start + chunk] for i in pending]
+        count_checks(stats, sum(len(c) for c in chunks), 0)
+        is_prime_term = np.split(is_prime_batch(np.concatenate(chunks)), np.cumsum([len(c) for c in chunks[:-1]]))
+        next_pending = []
+
+        for i, terms, mask in zip(pending, chunks, is_prime_term):
+            if mask.any():
+                res[i] = int(terms[mask.argmax()])
+            elif start + chunk < len(candidates[i]):
+                next_pending.append(i)
+
+        pending = next_pending
+        start += chunk
+
+    return res
+
+
+def get_wheel(seq: np.ndarray, wheel_primes: Tuple[int, ...] = WHEEL_PRIMES) -> List[np.ndarray]:
+    """
+    Build a wheel of the sequence for the given small primes (an extension of splitting it into odd and even terms).
+
+    The terms of 'seq + offset' that are divisible by a wheel prime p are the terms with: seq % p == -offset % p
+    So they depend only on 'offset % wheel_size', where wheel_size is the product of the wheel primes.
+    For every such residue we keep only the terms which might be primes, in the order of seq.
+
+    A term equal to a wheel prime is also skipped,
+    so the wheel should be used only when the smallest term is larger than the wheel primes.
+
+    :param seq: The sequence
+    :param wheel_primes: The primes to build the wheel from
+    :return: A list, where the item at index 'offset % wheel_size' are the terms that should be checked
+    """
+
+    seq_residues = [(seq % p, p) for p in wheel_primes]
+    wheel = []
+
+    for residue in range(prod(wheel_primes)):
+        mask = np.ones(len(seq), dtype=bool)
+
+        for seq_residue, p in seq_residues:
+            mask &= seq_residue != -residue % p
+
+        wheel.append(seq[mask])
+
+    return wheel
+
+
+def get_wheel_grid(seq: np.ndarray, wheel: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack the wheel of the sequence into a 2D array, so the terms of many offsets can be gathered together.
+    Row 'offset % wheel_size' holds the wheel terms of that residue, and the last row holds the whole sequence
+    (for the offsets which are too small for the wheel). The rows are padded with their last term.
+
+    :param seq: The sequence
+    :param wheel: The wheel of the sequence (the result of 'get_wheel')
+    :return: The 2D array of terms, and the number of terms in each row
+    """
+
+    rows = wheel + [seq]
+    lengths = np.array([len(row) for row in rows])
+    grid = np.zeros((len(rows), len(seq)), dtype=seq.dtype)
+
+    for i, row in enumerate(rows):
+        grid[i, :len(row)] = row
+        grid[i, len(row):] = row[-1] if len(row) else 0
+
+    return grid, lengths
+
+
+def get_first_prime_terms(
+    offsets: np.ndarray,
+    grid: np.ndarray,
+    lengths: np.ndarray,
+    primes: np.ndarray | PrimeCache,
+    chunk: int = SHORT_CHUNK,
+    stats: Dict[str, int] | None = None,
+) -> np.ndarray:
+    """
+    Find the first (largest) prime term of many offsets of the sequence, by gathering their terms from a sieve together.
+
+    The terms of all the offsets are gathered into a 2D array (offsets[:, None] + terms), 'chunk' terms
+    of each offset at a time. Since the terms are sorted from the largest to the smallest, an offset is tested further
+    only if its current chunk has no prime.
+
+    :param offsets: The offsets to test
+    :param grid: The terms of every wheel residue (the result of 'get_wheel_grid')
+    :param lengths: The number of terms in each row of the grid
+    :param primes: A sieve of all the terms, primes[term] is True if the term is a prime
+    :param chunk: Number of terms of each offset gathered at a time
+    :param stats: A dictionary to count the tested offsets and primality checks in
+    :return: The largest prime term of each offset, 0 if it has no prime term
+    """
+
+    # The offsets which are too small for the wheel use the last row of the grid (the whole sequence)
+    rows = np.where(offsets > WHEEL_PRIMES[-1], offsets % (len(grid) - 1), len(grid) - 1)
+    res = np.zeros(len(offsets), dtype=grid.dtype)
+    pending = np.arange(len(offsets))
+    start = 0
+
+    while pending.size:
+        terms = grid[rows[pending], start:start + chunk] + offsets[pending, None]
+        # Ignore the padding after the last term of each row
+        is_prime_term = primes[terms] & (np.arange(start, start + terms.shape[1]) < lengths[rows[pending], None])
+        found = is_prime_term.any(axis=1)
+        first = is_prime_term.argmax(axis=1)
+
+        count_checks(stats, int(np.where(found, first + 1, lengths[rows[pending]] - start).clip(0, chunk).sum()), 0)
+        res[pending[found]] = terms[found, first[found]]
+
+        start += chunk
+        pending = pending[~found & (lengths[rows[pending]] > start)]
+
+    count_checks(stats, 0, len(offsets))
+
+    return res
+
+
+def save_checkpoint(path: str, n: int, global_offset: int, offset: int, steps: Bitmap | RingBitmap) -> None:
+    """
+    Save the search state to a binary (.npz) file.
+    The state is written to a temporary file and then renamed over the previous checkpoint,
+    so an interrupted save never corrupts it.
+
+    :param path: The checkpoint file
+    :param n: Number of elements in the sequence
+    :param global_offset: The term the steps array starts from
+    :param offset: The next step to check, relative to 'global_offset'
+    :param steps: The steps array with all the eliminations found so far
+    """
+
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            n=n,
+            global_offset=global_offset,
+            offset=offset,
+            **{f"steps_{key}": value for key, value in steps.state().items()},
+        )
+
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, n: int) -> Dict[str, Any]:
+    """
+    Load a search state that was saved by 'save_checkpoint'
+
+    :param path: The checkpoint file
+    :param n: Number of elements in the sequence, must match the saved one
+    :return: A dictionary with the keys: global_offset, offset, steps (the state of the steps array)
+    """
+
+    with np.load(path) as data:
+        state = {key: int(data[key]) for key in ("n", "global_offset", "offset")}
+        state["steps"] = {key[len("steps_"):]: data[key] for key in data.files if key.startswith("steps_")}
+
+    if (saved_n := state.pop("n")) != n:
+        raise ValueError(f"The checkpoint {path} is of a sequence with {saved_n} terms (n = {n})")
+
+    return state
+
+
+def is_short_seq_checkpoint(path: str) -> bool:
+    """
+    Whether a checkpoint was saved by 'get_initial_short_seq' (a Bitmap) or by 'get_initial_any_seq' (a RingBitmap)
+    """
+
+    with np.load(path) as data:
+        return "steps_base" not in data.files
+
+
+def get_memory_budget() -> int:
+    """
+    The default memory budget (in bytes) of the steps array and the sieve: a fraction of the available memory
+    """
+
+    try:
+        pages = os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError):
+        # Not every platform reports the available memory, use the physical memory instead
+        pages = os.sysconf("SC_PHYS_PAGES")
+
+    return int(pages * os.sysconf("SC_PAGE_SIZE") * MEMORY_BUDGET_FRACTION)
+
+
+def get_short_seq_sizes(n: int, start_term: int, memory_budget: int, cached_sieve: bool = False) -> Tuple[int, int]:
+    """
+    Pick the steps array size of 'get_initial_short_seq', which is also the bound of its sieve.
+
+    Every offset takes a bit in the steps array and a byte in the sieve (a bit for every odd number in a cached sieve),
+    and the steps array keeps HOT_SIZE offsets unpacked on top of that (a byte per offset).
+    The search starts with a steps array that covers twice the offsets up to the start term and the longest elimination
+    from it, and doubles it whenever the search runs past it, up to the largest size that fits in the memory budget.
+
+    While the steps array grows, its old bytes may be copied (a bit for every two offsets of the new size).
+    The old sieve is dropped before that, so it fits in the byte of the sieve, but a cached sieve stays,
+    so then the copy is added to the budget.
+
+    :param n: Number of elements in the sequence
+    :param start_term: From which term to start the check
+    :param memory_budget: The memory (in bytes) the steps array and the sieve may take
+    :param cached_sieve: Whether the sieve is kept in a PrimeCache
+    :return: The initial size and the largest size of the steps array, the initial size is 0 if it doesn't fit
+    """
+
+    max_size = int(max(memory_budget - HOT_SIZE, 0) / (1 / 8 + (1 / 16 + 1 / 16 if cached_sieve else 1)))
+    min_size = start_term + n * (n - 1) // 2 + 1
+
+    if min_size > max_size:
+        return 0, max_size
+
+    return min(max(MIN_STEPS_SIZE, 2 * min_size), max_size), max_size
+
+
+def get_any_seq_size(n: int, memory_budget: int | None = None) -> int:
+    """
+    Pick the size of the steps array window of 'get_initial_any_seq'.
+
+    The eliminations of an offset reach at most n * (n - 1) / 2 offsets ahead of it, and the window keeps
+    at least half of its size ahead of the current offset, so a window of 4 times that never overflows.
+    The size is rounded to a power of two. The window takes a bit per offset, and HOT_SIZE offsets of it
+    are also kept unpacked (a byte per offset).
+
+    :param n: Number of elements in the sequence
+    :param memory_budget: The memory (in bytes) the steps array may take (None - no limit)
+    :return: The size of the steps array window
+    """
+
+    # A power of two, so the window maps an index to its position with a mask
+    size = 1 << (max(MIN_STEPS_SIZE, 2 * n * (n - 1)) - 1).bit_length()
+
+    if memory_budget is not None:
+        while size > 1 and size // 8 + min(size, HOT_SIZE) > memory_budget:
+            size >>= 1
+
+    return size
+
+
+def get_initial_naive(n: int, start_term: int = 1, stats: Dict[str, int] | None = None) -> int:
     """
     The most naive approach to find the initial term of the sequence.
     This function will find X_1000, but it will take too much time.
 
     :param n: Number of elements in the sequence
     :param start_term: From which term to start the check
+    :param stats: A dictionary to count the tested offsets and primality checks in
     :return: The initial term that was found
     """
 
@@ -46,14 +422,27 @@ def get_initial_naive(n: int, start_term: int = 1) -> int:
             curr_term += i
 
             if is_prime(curr_term):
+                count_checks(stats, i + 1)
                 initial += 1
                 break
 
         else:
+            count_checks(stats, n)
             return initial
 
 
-def get_initial_short_seq(n: int, steps_arr_size: int, start_term: int) -> int:
+def get_initial_short_seq(
+    n: int,
+    steps_arr_size: int,
+    start_term: int,
+    steps_path: str | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool = False,
+    primes_path: str | None = None,
+    batch: int = SHORT_BATCH,
+    max_steps_arr_size: int | None = None,
+    stats: Dict[str, int] | None = None,
+) -> int:
     """
     Finds a valid sequence by iterating on a possible sequence from the largest term
     to the smallest term and eliminating future sequences in the process.
@@ -65,41 +454,111 @@ def get_initial_short_seq(n: int, steps_arr_size: int, start_term: int) -> int:
 
     A step is an offset of the initial sequence (1, 2, 4, 7, ...)
 
-    The function precompute all the primes in the range [0:steps_arr_size]
+    The function precompute all the primes in the range [0:steps_arr_size],
+    or loads them from an on-disk sieve cache (primes_path) and extends the cache if it's too short.
+    When the search runs past the steps array, the steps array and the sieve are doubled (up to max_steps_arr_size),
+    keeping the eliminations in the steps array.
+    The next 'batch' offsets that weren't eliminated are tested together with 2D numpy gathers from the sieve,
+    and their eliminations are applied together. An offset eliminated by an earlier offset of the same batch
+    is tested anyway, its prime term is still a valid elimination.
 
     :param n: Number of elements in the sequence
     :param steps_arr_size: Length of the steps array
     :param start_term: From which term to start the check
-    :return: The initial term that was found
+    :param steps_path: A file to memory-map the steps array to (None - keep it in memory)
+    :param checkpoint_path: A file to save the search state to every CHECKPOINT_INTERVAL seconds
+    :param resume: Continue the search from the state saved in 'checkpoint_path'
+    :param primes_path: A file to cache the sieve in (None - compute the sieve in memory)
+    :param batch: Number of offsets tested together
+    :param max_steps_arr_size: The largest size the steps array may grow to (None - no limit)
+    :param stats: A dictionary to count the tested offsets and primality checks in
+    :return: The initial term that was found, -1 if no initial term was found before the steps array reached its
+             largest size (the offsets up to 'max_steps_arr_size - n * (n - 1) / 2' were checked)
     """
 
     seq = np.flip(np.cumsum(np.arange(n)))
-    seq_odd = seq[seq % 2 != 0]
-    seq_even = seq[seq % 2 == 0]
-    primes = get_primes_till_n(steps_arr_size)
-    steps = np.ones(steps_arr_size, dtype=bool)
-    offset = start_term - 1
+    grid, lengths = get_wheel_grid(seq, get_wheel(seq))
+    # The eliminations (and the terms) of an offset reach at most this far ahead of it
+    max_elimination = int(seq[0])
+
+    if resume:
+        state = load_checkpoint(checkpoint_path, n)
+        steps = Bitmap.from_state(state["steps"], path=steps_path)
+        offset = state["offset"] - 1
+    else:
+        steps = Bitmap(steps_arr_size, path=steps_path)
+        offset = start_term - 1
+
+    if primes_path is None:
+        primes = get_primes_till_n(len(steps))
+    else:
+        primes = PrimeCache(primes_path)
+        primes.extend(len(steps))
+
+    next_checkpoint = time.time() + CHECKPOINT_INTERVAL
 
     while True:
-        offset += 1
+        if time.time() >= next_checkpoint:
+            if checkpoint_path:
+                # All the steps up to 'offset' were checked, so we'll continue from the next one
+                save_checkpoint(checkpoint_path, n, 0, offset + 1, steps)
+
+            steps.flush()
+            next_checkpoint = time.time() + CHECKPOINT_INTERVAL
+
+        # Collect the next steps that weren't eliminated, whose terms and eliminations are inside the steps array
+        offsets = steps.find_all(offset + 1, batch)
+        offsets = offsets[offsets < len(steps) - max_elimination]
 
-        if steps[offset]:
-            # We check only the odd number because even number are not primes
-            curr_seq = seq_even if offset % 2 != 0 else seq_odd
+        if not offsets.size:
+            if max_steps_arr_size is not None and len(steps) >= max_steps_arr_size:
+                steps.flush()
+                return -1
 
-            for term in curr_seq + offset:
-                if primes[term]:
-                    # mark all the places in 'steps[term - seq]' as False,
-                    # so we'll know to skip them if we'll reach them
-                    steps[term - seq] = False
-                    break
+            # Grow the steps array and the sieve, the steps we haven't reached keep their eliminations
+            size = 2 * len(steps) if max_steps_arr_size is None else min(2 * len(steps), max_steps_arr_size)
+            offset = max(offset, len(steps) - max_elimination - 1)
+
+            if primes_path is None:
+                # Drop the old sieve first, so it isn't alive together with the grown steps array and the new sieve
+                primes = None
+                steps.grow(size)
+                primes = get_primes_till_n(size)
             else:
-                return offset
+                steps.grow(size)
+                primes.extend(size)
+
+            continue
+
+        # We check only the terms which aren't divisible by the wheel primes
+        prime_terms = get_first_prime_terms(offsets, grid, lengths, primes, stats=stats)
+
+        if not prime_terms.all():
+            # The earlier offsets of the batch have a prime term, so the first offset without one is the solution
+            steps.flush()
+            return int(offsets[prime_terms.argmin()])
 
+        # mark all the future places in 'steps[term - seq]' as False,
+        # so we'll know to skip them if we'll reach them
+        eliminated = prime_terms[:, None] - seq
+        steps[eliminated[eliminated > offsets[:, None]]] = False
 
-def get_initial_any_seq(n: int, steps_arr_size: int, start_term: int) -> int:
+        offset = int(offsets[-1])
+
+
+def iter_composite_offsets(
+    n: int,
+    start_term: int = 1,
+    stop_term: int | None = None,
+    steps_arr_size: int | None = None,
+    steps_path: str | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool = False,
+    primality: str = "sieve",
+    stats: Dict[str, int] | None = None,
+) -> Iterator[int]:
     """
-    Finds a valid sequence by iterating on a possible sequence from the largest term
+    Finds the valid sequences by iterating on a possible sequence from the largest term
     to the smallest term and eliminating future sequences in the process.
 
     We eliminate future sequences by setting: steps[term - seq] = False
@@ -109,68 +568,253 @@ def get_initial_any_seq(n: int, steps_arr_size: int, start_term: int) -> int:
 
     A step is an offset of the initial sequence (1, 2, 4, 7, ...)
 
-    To be able to deal with any sequence length, the function calculates each prime number when it reaches it.
-    The function has a fixed-size steps array which is reset and offset every time the current step
-    passes the array size.
+    To be able to deal with any sequence length, the primes are taken from a segmented sieve window
+    which slides forward with the current offset, so each primality test is an array lookup.
+    Alternatively (primality="mr"), the terms are tested with a batched Miller-Rabin test, which needs no precomputed
+    primes and works for any term below 2^64 (the terms are kept as uint64). The next MR_BATCH offsets
+    that weren't eliminated are tested together in one call, and their results are used when we reach them.
+    The steps array is a fixed-size window which slides forward with the current step (a RingBitmap),
+    so the eliminations ahead of the current step are kept when the window slides,
+    and eliminations beyond the window end are replayed when the window reaches them.
+
+    The search state (the steps array and the sieve window) is kept between the yielded terms,
+    so getting the next initial term continues the search from the previous one.
 
     :param n: Number of elements in the sequence
-    :param steps_arr_size: Length of the steps array
     :param start_term: From which term to start the check
-    :return: The initial term that was found
+    :param stop_term: Stop the check before this term (None - never stop)
+    :param steps_arr_size: Length of the steps array window (None - pick it with 'get_any_seq_size')
+    :param steps_path: A file to memory-map the steps array to (None - keep it in memory)
+    :param checkpoint_path: A file to save the search state to every CHECKPOINT_INTERVAL seconds
+    :param resume: Continue the search from the state saved in 'checkpoint_path'
+    :param primality: How to test the terms, one of PRIMALITY_TESTS
+    :param stats: A dictionary to count the tested offsets and primality checks in
+    :return: Yields the initial terms of all the valid sequences, in increasing order, until 'stop_term'
     """
 
-    seq = np.flip(start_term + np.cumsum(np.arange(n)))
-    seq_odd = seq[seq % 2 != 0]
-    seq_even = seq[seq % 2 == 0]
-    steps = np.ones(steps_arr_size, dtype=bool)
-    global_offset = start_term
-    offset = 0
+    if primality not in PRIMALITY_TESTS:
+        raise ValueError(f"Unknown primality test {primality}, expected one of {PRIMALITY_TESTS}")
+
+    if resume:
+        state = load_checkpoint(checkpoint_path, n)
+        global_offset = state["global_offset"]
+        offset = state["offset"]
+        steps = RingBitmap.from_state(state["steps"], path=steps_path)
+    else:
+        global_offset = start_term
+        offset = 0
+        steps = RingBitmap(steps_arr_size or get_any_seq_size(n), path=steps_path)
+
+    # The terms relative to the initial term, the eliminated offsets are computed from them so they can't overflow
+    seq_steps = np.flip(np.cumsum(np.arange(n)))
+
+    if primality == "mr":
+        if global_offset + int(seq_steps[0]) >= 1 << 64:
+            raise ValueError(f"The terms of a sequence starting at {global_offset} don't fit in 64 bits")
+
+        seq = np.uint64(global_offset) + seq_steps.astype(np.uint64)
+    else:
+        seq = global_offset + seq_steps
+
+    wheel = get_wheel(seq)
+    # The window must hold at least a whole sequence, the rest is how far we advance between slides
+    primes = PrimeWindow(int(seq[0] - seq[-1]) + PRIME_WINDOW_SIZE)
+    mr_prime_terms: Dict[int, int | None] = {}  # the largest prime term of tested offsets (primality="mr")
+    next_checkpoint = time.time() + CHECKPOINT_INTERVAL
 
     while True:
-        if steps[offset]:
-            # We check only the odd number because even number are not primes
-            curr_seq = seq_even if offset % 2 != 0 else seq_odd
-
-            for idx, term in enumerate(curr_seq + offset):
-                if is_prime(int(term)):
-                    try:
-                        # Mark all the places in 'steps[term - seq[idx + 1:]]' as False (skip step)
-                        # Starting seq from idx to prevent getting negative values
-                        steps[term - seq[idx + 1:]] = False
-
-                    except IndexError:
-                        print(
-                            f"Adding offset. Current offset = {global_offset + offset}"
-                        )
-
-                        # Adding offset to the sequence
-                        global_offset += offset
-                        seq += offset
-                        seq_odd = seq[seq % 2 != 0]
-                        seq_even = seq[seq % 2 == 0]
-
-                        # Creating a new initialed steps array
-                        steps = np.ones(steps_arr_size, dtype=bool)
-                        # We need to multiply idx by 2 because we divided seq into 2 arrays
-                        steps[term - seq[idx * 2 + 1:]] = False
-
-                        offset = 0
-                    break
-            else:
-                return global_offset + offset
+        if time.time() >= next_checkpoint:
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, n, global_offset, offset, steps)
+
+            steps.flush()
+            next_checkpoint = time.time() + CHECKPOINT_INTERVAL
+
+        # Skip to the next step that wasn't eliminated
+        offset = steps.find_next(offset)
+
+        if stop_term is not None and global_offset + offset >= stop_term:
+            return
+
+        if primality == "mr":
+            if offset not in mr_prime_terms:
+                batch = [offset]
+
+                # Look ahead only inside the current window, the window slides only when we reach the offsets
+                while len(batch) < MR_BATCH and (next_offset := steps.find_next(batch[-1] + 1, advance=False)) != -1:
+                    batch.append(next_offset)
+
+                if int(seq[0]) + batch[-1] >= 1 << 64:
+                    raise ValueError(f"The terms of offset {global_offset + batch[-1]} don't fit in 64 bits")
+
+                # We check only the terms which aren't divisible by the wheel primes
+                candidates = [
+                    (wheel[o % len(wheel)] if seq[-1] + o > WHEEL_PRIMES[-1] else seq) + o for o in batch
+                ]
+                prime_terms = get_largest_prime_terms(candidates, stats=stats)
+                mr_prime_terms = dict(zip(batch, prime_terms))
+
+            prime_term = mr_prime_terms.pop(offset)
+        else:
+            # We check only the terms which aren't divisible by the wheel primes
+            curr_seq = wheel[offset % len(wheel)] if seq[-1] + offset > WHEEL_PRIMES[-1] else seq
+
+            if seq[0] + offset >= primes.high:
+                primes.slide(int(seq[-1] + offset))
+
+            # All the terms are looked up together, the first prime is the largest
+            first = primes.first_prime(curr_seq + offset)
+            prime_term = curr_seq[first] + offset if first != -1 else None
+
+            count_checks(stats, first + 1 if prime_term is not None else len(curr_seq))
+
+        if prime_term is None:
+            steps.flush()
+            yield global_offset + offset
+        else:
+            # Mark all the future places in 'steps[prime_term - seq]' as False (skip step)
+            eliminated = int(prime_term - global_offset) - seq_steps
+            steps[eliminated[eliminated > offset]] = False
 
         offset += 1
 
 
-def get_sequence_initial(n: int, start_term: int = 1) -> int:
+def get_initial_any_seq(
+    n: int,
+    steps_arr_size: int,
+    start_term: int,
+    stop_term: int | None = None,
+    steps_path: str | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool = False,
+    primality: str = "sieve",
+    stats: Dict[str, int] | None = None,
+) -> int:
+    """
+    Finds the first valid sequence with 'iter_composite_offsets', which works for any sequence length.
+
+    :param n: Number of elements in the sequence
+    :param steps_arr_size: Length of the steps array window
+    :param start_term: From which term to start the check
+    :param stop_term: Stop the check before this term (None - never stop)
+    :param steps_path: A file to memory-map the steps array to (None - keep it in memory)
+    :param checkpoint_path: A file to save the search state to every CHECKPOINT_INTERVAL seconds
+    :param resume: Continue the search from the state saved in 'checkpoint_path'
+    :param primality: How to test the terms, one of PRIMALITY_TESTS
+    :param stats: A dictionary to count the tested offsets and primality checks in
+    :return: The initial term that was found, -1 if no initial term was found before 'stop_term'
+    """
+
+    offsets = iter_composite_offsets(
+        n, start_term, stop_term, steps_arr_size, steps_path, checkpoint_path, resume, primality, stats
+    )
+
+    return next(offsets, -1)
+
+
+def get_initial_shard(n: int, start_term: int, stop_term: int, primality: str = "sieve") -> int:
+    """
+    Scan a single shard of offsets [start_term, stop_term) with its own steps array.
+    The steps array covers the shard and the longest elimination from it, so it is never reset.
+
+    :param n: Number of elements in the sequence
+    :param start_term: The first term of the shard
+    :param stop_term: The first term after the shard
+    :param primality: How to test the terms, one of PRIMALITY_TESTS
+    :return: The initial term that was found, -1 if the shard has no valid initial term
+    """
+
+    max_elimination = n * (n - 1) // 2
+    return get_initial_any_seq(
+        n, stop_term - start_term + max_elimination + 1, start_term, stop_term, primality=primality
+    )
+
+
+def get_initial_parallel(
+    n: int, start_term: int, workers: int, shard_size: int = SHARD_SIZE, primality: str = "sieve"
+) -> int:
+    """
+    Split the offsets into shards of 'shard_size' terms and scan them in a process pool.
+
+    Shards are submitted in increasing order, keeping every worker busy.
+    Once a shard finds a valid initial term, we stop submitting new shards and cancel the pending shards
+    above it, and wait only for the shards below it, since they might contain a smaller initial term.
+
+    :param n: Number of elements in the sequence
+    :param start_term: From which term to start the check
+    :param workers: Number of worker processes
+    :param shard_size: Number of offsets in each shard
+    :param primality: How to test the terms, one of PRIMALITY_TESTS
+    :return: The initial term that was found
+    """
+
+    executor = ProcessPoolExecutor(workers)
+    pending: Dict[Future, int] = {}  # future -> the first term of its shard
+    next_shard = start_term
+    res = -1
+
+    try:
+        while True:
+            # Keep two shards per worker in flight, so workers won't wait for the coordinator
+            while res == -1 and len(pending) < 2 * workers:
+                future = executor.submit(get_initial_shard, n, next_shard, next_shard + shard_size, primality)
+                pending[future] = next_shard
+                next_shard += shard_size
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                del pending[future]
+                shard_res = future.result()
+
+                if shard_res != -1 and (res == -1 or shard_res < res):
+                    res = shard_res
+
+            if res != -1:
+                # Shards above the found term can't improve it
+                for future, shard_start in list(pending.items()):
+                    if shard_start > res:
+                        future.cancel()
+                        del pending[future]
+
+                if not pending:
+                    return res
+
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_sequence_initial(
+    n: int,
+    start_term: int = 1,
+    workers: int = 1,
+    steps_path: str | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool = False,
+    primality: str = "sieve",
+    primes_path: str | None = None,
+    memory_budget: int | None = None,
+) -> int:
     """
     Finding the initial term of the sequence.
     The function 'get_initial_any_seq' can calculate the initial term for any sequence length.
     The function 'get_initial_short_seq' precalculate all the primes in a certain range,
-    so for short sequence this function is faster.
+    so when the range fits in the memory budget this function is faster.
+    If it reaches the end of the memory budget without a result, the search continues with 'get_initial_any_seq'.
+    With more than one worker, the offsets are split into shards and scanned by 'get_initial_parallel'.
 
     :param n: Number of elements in the sequence
     :param start_term: From which term to start the check
+    :param workers: Number of worker processes
+    :param steps_path: A file to memory-map the steps array to (None - keep it in memory),
+                       ignored when the search is split between workers
+    :param checkpoint_path: A file to save the search state to periodically,
+                            ignored when the search is split between workers
+    :param resume: Continue the search from the state saved in 'checkpoint_path'
+    :param primality: How to test the terms, one of PRIMALITY_TESTS ('get_initial_short_seq' always uses a sieve)
+    :param primes_path: A file to cache the sieve of 'get_initial_short_seq' in (None - compute it in memory)
+    :param memory_budget: The memory (in bytes) the steps array and the sieve may take
+                          (None - a fraction of the available memory)
     :return: The initial term that was found
     """
 
@@ -186,10 +830,127 @@ def get_sequence_initial(n: int, start_term: int = 1) -> int:
     if start_term < 1:
         start_term = 1
 
-    if n <= 1000:
-        return get_initial_short_seq(n, 200000000, start_term)
+    if workers > 1:
+        return get_initial_parallel(n, start_term, workers, primality=primality)
+
+    if memory_budget is None:
+        memory_budget = get_memory_budget()
+
+    steps_arr_size, max_steps_arr_size = get_short_seq_sizes(n, start_term, memory_budget, primes_path is not None)
 
-    return get_initial_any_seq(n, 1000000000, start_term)
+    if resume:
+        short_seq = is_short_seq_checkpoint(checkpoint_path)
+    else:
+        short_seq = primality == "sieve" and steps_arr_size > 0
+
+    if short_seq:
+        res = get_initial_short_seq(
+            n,
+            steps_arr_size,
+            start_term,
+            steps_path=steps_path,
+            checkpoint_path=checkpoint_path,
+            resume=resume,
+            primes_path=primes_path,
+            max_steps_arr_size=max_steps_arr_size,
+        )
+
+        if res != -1:
+            return res
+
+        # Continue from the last offset the short sequence search checked
+        start_term = max(start_term, max_steps_arr_size - n * (n - 1) // 2)
+        resume = False
+
+    return get_initial_any_seq(
+        n,
+        get_any_seq_size(n, memory_budget),
+        start_term,
+        steps_path=steps_path,
+        checkpoint_path=checkpoint_path,
+        resume=resume,
+        primality=primality,
+    )
+
+
+def iter_sequence_table(
+    first_n: int, last_n: int, start_term: int = 1, steps_arr_size: int | None = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    Find the initial terms X_first_n, ..., X_last_n in a single pass over the offsets.
+
+    A valid offset for n is also valid for every smaller n, so X_n never decreases with n.
+    We scan the offsets for the smallest n we haven't solved yet (the target), eliminating future offsets
+    the same way as 'get_initial_any_seq'. These eliminations stay valid when the target grows,
+    because a longer sequence contains the shorter one.
+    When an offset has no prime in the first 'target' terms, we count its leading composite terms (r),
+    and the offset is the initial term of every n from the target up to r.
+
+    :param first_n: The first number of elements to solve
+    :param last_n: The last number of elements to solve
+    :param start_term: From which term to start the check
+    :param steps_arr_size: Length of the steps array window (None - pick it with 'get_any_seq_size')
+    :return: Yields (n, initial term) as they are found, in increasing n
+    """
+
+    if first_n < 1 or last_n < first_n:
+        raise ValueError(f"Invalid range of sequence lengths ({first_n}..{last_n})")
+
+    global_offset = max(start_term, 1)
+    offset = 0
+    target = first_n
+    seq = np.flip(global_offset + np.cumsum(np.arange(last_n)))
+    wheel = get_wheel(seq)
+    steps = RingBitmap(steps_arr_size or get_any_seq_size(last_n))
+    primes = PrimeWindow(int(seq[0] - seq[-1]) + PRIME_WINDOW_SIZE)
+
+    while True:
+        # Skip to the next step that wasn't eliminated
+        offset = steps.find_next(offset)
+
+        if seq[0] + offset >= primes.high:
+            primes.slide(int(seq[-1] + offset))
+
+        # We check only the terms which aren't divisible by the wheel primes, out of the first 'target' terms
+        curr_seq = wheel[offset % len(wheel)] if seq[-1] + offset > WHEEL_PRIMES[-1] else seq
+        curr_seq = curr_seq[len(curr_seq) - np.searchsorted(curr_seq[::-1], seq[-target], side="right"):]
+        first = primes.first_prime(curr_seq + offset)
+        prime_term = curr_seq[first] + offset if first != -1 else None
+
+        if prime_term is None:
+            # Count the leading composite terms, the following terms are sorted from the smallest to the largest
+            next_terms = seq[-target - 1::-1] + offset if target < last_n else seq[:0]
+            first = primes.first_prime(next_terms)
+            run_length = target + (first if first != -1 else len(next_terms))
+
+            for n in range(target, min(run_length, last_n) + 1):
+                yield n, global_offset + offset
+
+            if run_length >= last_n:
+                return
+
+            # The term that ended the run, it eliminates future steps for the next target
+            prime_term = next_terms[run_length - target]
+            target = run_length + 1
+
+        # Mark all the future places in 'steps[prime_term - seq]' as False (skip step)
+        eliminated = prime_term - seq
+        steps[eliminated[eliminated > offset]] = False
+
+        offset += 1
+
+
+def parse_range(value: str) -> Tuple[int, int]:
+    """
+    Parse a range of sequence lengths of the form 'first..last'
+    """
+
+    first, _, last = value.partition("..")
+
+    try:
+        return int(first), int(last or first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid range '{value}', expected first..last")
 
 
 def parse_args() -> argparse.Namespace:
@@ -211,22 +972,146 @@ def parse_args() -> argparse.Namespace:
         dest="start_term",
         help="start solve from this term",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        default=1,
+        type=int,
+        dest="workers",
+        help="number of worker processes",
+    )
+    parser.add_argument(
+        "--steps-file",
+        default=None,
+        type=str,
+        dest="steps_file",
+        help="memory-map the steps array to this file",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        type=str,
+        dest="checkpoint",
+        help="periodically save the search state to this file",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        help="continue the search from the state saved in the checkpoint file",
+    )
+    parser.add_argument(
+        "--primality",
+        default="sieve",
+        choices=PRIMALITY_TESTS,
+        dest="primality",
+        help="test the terms with a segmented sieve or with a batched Miller-Rabin test",
+    )
+    parser.add_argument(
+        "--primes-cache",
+        default=None,
+        type=str,
+        dest="primes_cache",
+        help="cache the sieve of short sequences in this file, shared between runs",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        default=None,
+        type=int,
+        dest="memory_budget",
+        help="the memory (in MB) the steps array and the sieve may take (default: half of the available memory)",
+    )
+    parser.add_argument(
+        "--table",
+        default=None,
+        type=parse_range,
+        dest="table",
+        help="find the initial terms of all the sequence lengths in the range first..last",
+    )
+    parser.add_argument(
+        "--count",
+        default=None,
+        type=int,
+        dest="count",
+        help="print the initial terms of the first 'count' valid sequences, as they are found",
+    )
+    parser.add_argument(
+        "--out",
+        default=None,
+        type=str,
+        dest="out",
+        help="write the table to this CSV file (default: stdout)",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+
+    return args
+
+
+def write_table(first_n: int, last_n: int, start_term: int, out: TextIO) -> None:
+    """
+    Write the initial terms X_first_n, ..., X_last_n as CSV lines (n,initial), each line as soon as it's found
+    """
+
+    out.write("n,initial\n")
+
+    for n, initial in iter_sequence_table(first_n, last_n, start_term):
+        out.write(f"{n},{initial}\n")
+        out.flush()
 
 
 def main(args: argparse.Namespace):
+    if args.table:
+        if not args.out:
+            write_table(*args.table, args.start_term, sys.stdout)
+            return
+
+        print("Starting...")
+        start = time.time()
+
+        with open(args.out, "w") as f:
+            write_table(*args.table, args.start_term, f)
+
+        end = time.time()
+        print("Finished!")
+        print(f"Total time = {end - start} seconds")
+        print(f"Table of n={args.table[0]}..{args.table[1]} written to {args.out}")
+        return
+
+    if args.count:
+        offsets = iter_composite_offsets(args.numbers, max(args.start_term, 1), primality=args.primality)
+
+        for initial in islice(offsets, args.count):
+            print(initial, flush=True)
+
+        return
+
     start_term = args.start_term
     n = args.numbers
+    workers = args.workers
     print("Starting...")
 
     start = time.time()
-    res = get_sequence_initial(n, start_term)
+    memory_budget = args.memory_budget * 2**20 if args.memory_budget else None
+    res = get_sequence_initial(
+        n,
+        start_term,
+        workers,
+        args.steps_file,
+        args.checkpoint,
+        args.resume,
+        args.primality,
+        args.primes_cache,
+        memory_budget,
+    )
     end = time.time()
 
     print("Finished!")
     print(f"Total time = {end - start} seconds")
-    print(f"{n=}, {start_term=}")
+    print(f"{n=}, {start_term=}, {workers=}")
     print(f"Initial term found = {res}")
 
 
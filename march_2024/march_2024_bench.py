@@ -0,0 +1,196 @@
+"""
+IBM Ponder This - March 2024 Challenge - Benchmark
+
+Runs the solvers over a grid of sequence lengths and start terms close to the known solutions,
+so every run finishes in seconds, and writes the measurements as JSON so runs can be diffed.
+
+Each run is measured in a fresh process, so the peak RSS belongs to that run only.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from march_2024 import (
+    get_any_seq_size,
+    get_initial_any_seq,
+    get_initial_naive,
+    get_initial_short_seq,
+    get_memory_budget,
+    get_short_seq_sizes,
+)
+
+# Known solutions (from the module docstring of march_2024.py)
+KNOWN_INITIALS = {
+    1000: 115192665,
+    2024: 117778830159,
+}
+
+
+def run_short_seq(n: int, start_term: int, stats: Dict[str, int]) -> int:
+    """
+    Run 'get_initial_short_seq' with the steps array sizes get_sequence_initial picks
+    """
+
+    steps_arr_size, max_steps_arr_size = get_short_seq_sizes(n, start_term, get_memory_budget())
+    return get_initial_short_seq(n, steps_arr_size, start_term, max_steps_arr_size=max_steps_arr_size, stats=stats)
+
+
+STRATEGIES: Dict[str, Callable[[int, int, Dict[str, int]], int]] = {
+    "naive": lambda n, start_term, stats: get_initial_naive(n, start_term, stats=stats),
+    "short_seq": run_short_seq,
+    "any_seq": lambda n, start_term, stats: get_initial_any_seq(n, get_any_seq_size(n), start_term, stats=stats),
+}
+
+
+def run_case(strategy: str, n: int, start_term: int) -> Dict[str, Any]:
+    """
+    Run a single strategy and measure it (called in a fresh process)
+    """
+
+    stats: Dict[str, int] = {}
+
+    start = time.perf_counter()
+    res = STRATEGIES[strategy](n, start_term, stats)
+    wall_time = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10
+
+    return {
+        "initial": res,
+        "wall_time": wall_time,
+        "peak_rss_mb": peak_rss_mb,
+        "offsets_per_sec": (res - start_term + 1) / wall_time,
+        **stats,
+    }
+
+
+def is_supported(strategy: str, n: int, start_term: int, expected: int) -> bool:
+    """
+    'get_initial_short_seq' precomputes its primes up to the steps array size,
+    so it can't reach terms beyond the largest steps array that fits in the memory budget
+    """
+
+    _, max_steps_arr_size = get_short_seq_sizes(n, start_term, get_memory_budget())
+    return strategy != "short_seq" or expected + n * (n - 1) // 2 < max_steps_arr_size
+
+
+def run_benchmark(strategies: List[str], numbers: List[int], distances: List[int]) -> List[Dict[str, Any]]:
+    """
+    Run every strategy for every sequence length, starting 'distance' terms before its known solution
+    """
+
+    cases = []
+    ctx = get_context("spawn")
+
+    for n in numbers:
+        expected = KNOWN_INITIALS[n]
+
+        for distance in distances:
+            start_term = expected - distance
+
+            for strategy in strategies:
+                if not is_supported(strategy, n, start_term, expected):
+                    continue
+
+                # A new process for every run, so the measurements of one run won't affect the other
+                with ProcessPoolExecutor(1, mp_context=ctx) as executor:
+                    measurements = executor.submit(run_case, strategy, n, start_term).result()
+
+                case = {
+                    "strategy": strategy,
+                    "n": n,
+                    "start_term": start_term,
+                    "expected": expected,
+                    "correct": measurements["initial"] == expected,
+                    **measurements,
+                }
+                cases.append(case)
+
+                print(
+                    f"{strategy:>10} n={n:<5} start_term={start_term:<13} "
+                    f"time={case['wall_time']:.3f}s rss={case['peak_rss_mb']:.0f}MB "
+                    f"{'OK' if case['correct'] else 'WRONG'}",
+                    file=sys.stderr,
+                )
+
+    return cases
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-s",
+        "--strategies",
+        default=list(STRATEGIES),
+        nargs="+",
+        choices=list(STRATEGIES),
+        dest="strategies",
+        help="the strategies to benchmark",
+    )
+    parser.add_argument(
+        "-n",
+        "--numbers",
+        default=list(KNOWN_INITIALS),
+        nargs="+",
+        type=int,
+        choices=list(KNOWN_INITIALS),
+        dest="numbers",
+        help="the numbers of terms in the sequence (with a known solution)",
+    )
+    parser.add_argument(
+        "-d",
+        "--distances",
+        default=[10000, 100000],
+        nargs="+",
+        type=int,
+        dest="distances",
+        help="start each run this number of terms before the known solution",
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        default=None,
+        type=str,
+        dest="out",
+        help="write the JSON results to this file (default: stdout)",
+    )
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace):
+    cases = run_benchmark(args.strategies, args.numbers, args.distances)
+
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cases": cases,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    # A failing exit code, so a wrong answer won't pass unnoticed
+    if not all(case["correct"] for case in cases):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(parse_args())
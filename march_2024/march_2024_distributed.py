@@ -0,0 +1,300 @@
+"""
+IBM Ponder This - March 2024 Challenge - Distributed search
+
+Splits a range of offsets into fixed-size work units in a shared directory, so workers on several hosts
+can scan them without a coordination service:
+
+    plan.json             the search (n, the range of terms, the unit size, the primality test)
+    pending/<unit>.json   units waiting for a worker
+    claimed/<unit>.json   units a worker is scanning, claimed by an atomic rename from pending/
+    results/<unit>.json   the result of every scanned unit
+    found.json            the smallest initial term found so far, so the workers don't read all the results
+
+Every unit is scanned with its own steps array by 'get_initial_shard', like the shards of 'get_initial_parallel'.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from march_2024 import PRIMALITY_TESTS, get_initial_shard
+
+PENDING = "pending"
+CLAIMED = "claimed"
+RESULTS = "results"
+FOUND = "found.json"
+
+
+def unit_name(start_term: int) -> str:
+    # Zero padded, so the units sort by their first term
+    return f"{start_term:020d}.json"
+
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    """
+    Write a JSON file atomically, so a reader never sees a partially written file
+    """
+
+    # Workers on different hosts may share a pid
+    tmp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_units(directory: str, sub_dir: str) -> List[str]:
+    """
+    The names of the units in a sub-directory, from the lowest to the highest (without temporary files)
+    """
+
+    return sorted(name for name in os.listdir(os.path.join(directory, sub_dir)) if name.endswith(".json"))
+
+
+def read_results(directory: str) -> List[Dict[str, Any]]:
+    """
+    The results of the units that were scanned so far, from the lowest to the highest
+    """
+
+    return [read_json(os.path.join(directory, RESULTS, name)) for name in list_units(directory, RESULTS)]
+
+
+def plan(directory: str, n: int, start_term: int, stop_term: int, unit_size: int, primality: str = "sieve") -> int:
+    """
+    Write the work units of the offsets [start_term, stop_term) to a shared directory
+
+    :param directory: The shared directory
+    :param n: Number of elements in the sequence
+    :param start_term: The first term of the search
+    :param stop_term: The first term after the search
+    :param unit_size: Number of offsets in each unit
+    :param primality: How to test the terms, one of PRIMALITY_TESTS
+    :return: The number of units
+    """
+
+    if os.path.exists(os.path.join(directory, "plan.json")):
+        raise FileExistsError(f"{directory} already has a plan")
+
+    for sub_dir in (PENDING, CLAIMED, RESULTS):
+        os.makedirs(os.path.join(directory, sub_dir), exist_ok=True)
+
+    units = 0
+
+    for unit_start in range(start_term, stop_term, unit_size):
+        unit = {"n": n, "start_term": unit_start, "stop_term": min(unit_start + unit_size, stop_term)}
+        write_json(os.path.join(directory, PENDING, unit_name(unit_start)), unit)
+        units += 1
+
+    # Written last, so workers won't start before all the units exist
+    write_json(
+        os.path.join(directory, "plan.json"),
+        {"n": n, "start_term": start_term, "stop_term": stop_term, "unit_size": unit_size, "primality": primality},
+    )
+
+    return units
+
+
+def get_found_initial(directory: str) -> int:
+    """
+    The smallest initial term found by the units that were scanned so far, -1 if none was found
+    """
+
+    try:
+        return read_json(os.path.join(directory, FOUND))["initial"]
+    except FileNotFoundError:
+        return -1
+
+
+def update_found_initial(directory: str, initial: int) -> None:
+    """
+    Record an initial term found by a unit, if it's smaller than the recorded one.
+    Two workers may replace the file together, so a worker checks the file after writing it,
+    and writes it again until the recorded term isn't larger than its own.
+    """
+
+    while (found := get_found_initial(directory)) == -1 or initial < found:
+        write_json(os.path.join(directory, FOUND), {"initial": initial})
+
+
+def work(directory: str) -> int:
+    """
+    Claim and scan the pending units, from the lowest to the highest, until there are no pending units.
+    Units above an initial term that was already found can't improve it, so the worker stops when it reaches them.
+
+    :param directory: The shared directory
+    :return: The number of units this worker scanned
+    """
+
+    primality = read_json(os.path.join(directory, "plan.json"))["primality"]
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    scanned = 0
+
+    for name in list_units(directory, PENDING):
+        claimed_path = os.path.join(directory, CLAIMED, name)
+
+        try:
+            # Only one worker can rename the unit, the others get FileNotFoundError
+            os.rename(os.path.join(directory, PENDING, name), claimed_path)
+        except FileNotFoundError:
+            continue
+
+        unit = read_json(claimed_path)
+        found = get_found_initial(directory)
+
+        if found != -1 and found < unit["start_term"]:
+            # Return the unit, so the plan still shows the offsets that weren't scanned
+            os.rename(claimed_path, os.path.join(directory, PENDING, name))
+            break
+
+        start = time.time()
+        initial = get_initial_shard(unit["n"], unit["start_term"], unit["stop_term"], primality)
+
+        write_json(
+            os.path.join(directory, RESULTS, name),
+            {**unit, "initial": initial, "time": time.time() - start, "worker": worker},
+        )
+        os.remove(claimed_path)
+        scanned += 1
+
+        if initial != -1:
+            update_found_initial(directory, initial)
+
+    return scanned
+
+
+def requeue(directory: str) -> int:
+    """
+    Return the claimed units without a result to the pending units (e.g. after a worker crashed).
+    Run it only when no worker is running, since a running worker's unit has no result yet.
+
+    :param directory: The shared directory
+    :return: The number of units that were returned
+    """
+
+    names = [
+        name
+        for name in list_units(directory, CLAIMED)
+        if not os.path.exists(os.path.join(directory, RESULTS, name))
+    ]
+
+    for name in names:
+        os.rename(os.path.join(directory, CLAIMED, name), os.path.join(directory, PENDING, name))
+
+    return len(names)
+
+
+def merge(directory: str) -> Dict[str, Any]:
+    """
+    Merge the results of the scanned units.
+
+    The smallest initial term that was found is the initial term of the search only if the offsets below it
+    were all scanned, so the gaps in the coverage below it are reported as well.
+
+    :param directory: The shared directory
+    :return: A dictionary with the keys: n, initial (-1 if none was found), complete (no gaps below the initial term,
+             or in the whole range if none was found), gaps (the ranges [start, stop) that weren't scanned)
+    """
+
+    search = read_json(os.path.join(directory, "plan.json"))
+    results = read_results(directory)
+
+    gaps: List[Tuple[int, int]] = []
+    covered = search["start_term"]
+
+    for result in results:
+        if result["start_term"] > covered:
+            gaps.append((covered, result["start_term"]))
+
+        covered = max(covered, result["stop_term"])
+
+    if covered < search["stop_term"]:
+        gaps.append((covered, search["stop_term"]))
+
+    initial = min((result["initial"] for result in results if result["initial"] != -1), default=-1)
+    end = search["stop_term"] if initial == -1 else initial
+
+    return {
+        "n": search["n"],
+        "initial": initial,
+        "complete": not any(gap_start < end for gap_start, _ in gaps),
+        "gaps": gaps,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="write the work units to the shared directory")
+    plan_parser.add_argument("directory", type=str, help="the shared directory")
+    plan_parser.add_argument(
+        "-n", "--numbers", default=1000, type=int, dest="numbers", help="number of terms in the sequence"
+    )
+    plan_parser.add_argument(
+        "-st", "--start-term", default=1, type=int, dest="start_term", help="the first term of the search"
+    )
+    plan_parser.add_argument(
+        "--stop-term", required=True, type=int, dest="stop_term", help="the first term after the search"
+    )
+    plan_parser.add_argument(
+        "--unit-size", default=10000000, type=int, dest="unit_size", help="number of offsets in each unit"
+    )
+    plan_parser.add_argument(
+        "--primality",
+        default="sieve",
+        choices=PRIMALITY_TESTS,
+        dest="primality",
+        help="test the terms with a segmented sieve or with a batched Miller-Rabin test",
+    )
+
+    for command, help_text in (
+        ("work", "claim and scan the pending units"),
+        ("requeue", "return the claimed units without a result to the pending units"),
+        ("merge", "report the initial term and the gaps in the coverage"),
+    ):
+        sub_parser = subparsers.add_parser(command, help=help_text)
+        sub_parser.add_argument("directory", type=str, help="the shared directory")
+
+    args = parser.parse_args()
+
+    if args.command == "plan" and (args.unit_size < 1 or args.stop_term <= max(args.start_term, 1)):
+        parser.error("the range of terms is empty, or the unit size is smaller than 1")
+
+    return args
+
+
+def main(args: argparse.Namespace):
+    if args.command == "plan":
+        units = plan(
+            args.directory, args.numbers, max(args.start_term, 1), args.stop_term, args.unit_size, args.primality
+        )
+        print(f"{units} units written to {args.directory}")
+
+    elif args.command == "work":
+        print(f"Scanned {work(args.directory)} units")
+
+    elif args.command == "requeue":
+        print(f"Returned {requeue(args.directory)} units")
+
+    elif args.command == "merge":
+        res = merge(args.directory)
+        json.dump(res, sys.stdout, indent=2)
+        print()
+
+        # A failing exit code, so an incomplete search won't pass unnoticed
+        if not res["complete"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(parse_args())
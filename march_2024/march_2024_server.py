@@ -0,0 +1,205 @@
+"""
+IBM Ponder This - March 2024 Challenge - Solver server
+
+A long-running solver that answers many queries without paying for the imports, the sieve and the steps array
+on every query. Every query is a JSON line: {"n": 1000, "start_term": 1}
+and its answer is a JSON line: {"n": 1000, "start_term": 1, "initial": 115192665, "cached": false, "time": 12.3}
+
+The search of every sequence length is kept in memory (its steps array, its sieve window and the initial terms
+it found), so a query inside the range that was already scanned is answered from the found terms,
+and a query after it continues the same search instead of starting a new one.
+Up to MAX_SCANS searches are kept, the least recently queried search is dropped to make room for a new one.
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, TextIO
+
+from march_2024 import PRIMALITY_TESTS, get_any_seq_size, iter_composite_offsets
+
+MAX_SCANS = 8  # number of sequence lengths whose search is kept in memory, the least recently queried is dropped
+
+
+class Scan:
+    """
+    The search of a single sequence length, from 'start_term' on.
+    All the initial terms in [start_term, reached) were found, and are kept in 'found'.
+    """
+
+    def __init__(self, n: int, start_term: int, primality: str):
+        self.n: int = n
+        self.start_term: int = start_term
+        self.reached: int = start_term
+        self.found: List[int] = []
+        self._offsets: Iterator[int] = iter_composite_offsets(n, start_term, primality=primality)
+
+    def find(self, start_term: int) -> int:
+        """
+        The first initial term >= start_term, continuing the search if it wasn't found yet
+        """
+
+        if (i := bisect_left(self.found, start_term)) < len(self.found):
+            return self.found[i]
+
+        for initial in self._offsets:
+            self.found.append(initial)
+            self.reached = initial + 1
+
+            if initial >= start_term:
+                return initial
+
+        raise RuntimeError(f"The search of n={self.n} ended")
+
+    def close(self) -> None:
+        """
+        Stop the search, releasing its steps array and its sieve window
+        """
+
+        self._offsets.close()
+
+
+class Solver:
+    """
+    Keeps a scan for each of the 'max_scans' most recently queried sequence lengths
+    """
+
+    def __init__(self, primality: str = "sieve", max_scans: int = MAX_SCANS):
+        self.primality: str = primality
+        self.max_scans: int = max_scans
+        self.scans: OrderedDict[int, Scan] = OrderedDict()
+
+    def _new_scan(self, n: int, start_term: int) -> Scan:
+        """
+        Start a new scan of n (replacing the current one), dropping the least recently queried scans above 'max_scans'
+        """
+
+        if (scan := self.scans.pop(n, None)) is not None:
+            scan.close()
+
+        while self.scans and len(self.scans) >= self.max_scans:
+            self.scans.popitem(last=False)[1].close()
+
+        scan = self.scans[n] = Scan(n, start_term, self.primality)
+
+        return scan
+
+    def query(self, n: int, start_term: int = 1) -> Dict[str, Any]:
+        """
+        Find the initial term of the sequence with n terms, starting from 'start_term'
+        """
+
+        if n < 1:
+            raise ValueError(f"n is smaller than 1 (n = {n})")
+
+        start_term = max(start_term, 1)
+        scan = self.scans.get(n)
+
+        # A scan that started after the query can't answer it, and continuing a scan far behind the query
+        # takes longer than a new scan (none of its eliminations reach the query)
+        if scan is None or start_term < scan.start_term or start_term > scan.reached + get_any_seq_size(n):
+            scan = self._new_scan(n, start_term)
+        else:
+            self.scans.move_to_end(n)
+
+        cached = start_term < scan.reached and bisect_left(scan.found, start_term) < len(scan.found)
+
+        start = time.time()
+        initial = scan.find(start_term)
+
+        return {"n": n, "start_term": start_term, "initial": initial, "cached": cached, "time": time.time() - start}
+
+    def handle(self, line: str) -> str:
+        """
+        Answer a single JSON line query with a JSON line
+        """
+
+        try:
+            request = json.loads(line)
+            response = self.query(int(request["n"]), int(request.get("start_term", 1)))
+        except KeyError as e:
+            response = {"error": f"missing key {e}"}
+        except (ValueError, TypeError) as e:
+            response = {"error": str(e)}
+
+        return json.dumps(response)
+
+
+def serve_lines(solver: Solver, lines: TextIO, out: TextIO) -> None:
+    """
+    Answer the queries of 'lines' (one per line) to 'out', each answer as soon as it's found
+    """
+
+    for line in lines:
+        if line.strip():
+            out.write(solver.handle(line) + "\n")
+            out.flush()
+
+
+def serve_socket(solver: Solver, path: str) -> None:
+    """
+    Answer the queries of the connections to a Unix socket, one connection at a time.
+    All the connections share the same scans.
+    """
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write((solver.handle(line.decode()) + "\n").encode())
+                    self.wfile.flush()
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--socket",
+        default=None,
+        type=str,
+        dest="socket",
+        help="serve the queries on this Unix socket (default: read the queries from stdin)",
+    )
+    parser.add_argument(
+        "--primality",
+        default="sieve",
+        choices=PRIMALITY_TESTS,
+        dest="primality",
+        help="test the terms with a segmented sieve or with a batched Miller-Rabin test",
+    )
+    parser.add_argument(
+        "--max-scans",
+        default=MAX_SCANS,
+        type=int,
+        dest="max_scans",
+        help="number of sequence lengths whose search is kept in memory",
+    )
+
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace):
+    solver = Solver(args.primality, args.max_scans)
+
+    if args.socket:
+        serve_socket(solver, args.socket)
+    else:
+        serve_lines(solver, sys.stdin, sys.stdout)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,153 @@
+"""
+Deterministic Miller-Rabin primality test for numpy arrays of 64-bit numbers.
+
+Modular multiplication is done in Montgomery form with 32-bit limbs, so no intermediate value overflows uint64.
+"""
+
+import numpy as np
+
+# Testing these bases is enough for every number below 2^64
+# Reference: https://miller-rabin.appspot.com/
+WITNESSES = (2, 325, 9375, 28178, 450775, 9780504, 1795265022)
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+_LOW_32 = np.uint64(0xFFFFFFFF)
+_32 = np.uint64(32)
+_1 = np.uint64(1)
+
+
+def _mul_wide(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Multiply two uint64 arrays into 128-bit products
+
+    :return: The high and the low 64 bits of the products
+    """
+
+    a_lo, a_hi = a & _LOW_32, a >> _32
+    b_lo, b_hi = b & _LOW_32, b >> _32
+
+    lo_lo = a_lo * b_lo
+    lo_hi = a_lo * b_hi
+    hi_lo = a_hi * b_lo
+
+    # The middle 64 bits, with the carries of the low part (at most 3 * 2^32, so it can't overflow)
+    mid = (lo_lo >> _32) + (lo_hi & _LOW_32) + (hi_lo & _LOW_32)
+
+    lo = (lo_lo & _LOW_32) | (mid << _32)
+    hi = a_hi * b_hi + (lo_hi >> _32) + (hi_lo >> _32) + (mid >> _32)
+
+    return hi, lo
+
+
+def _mont_mul(a: np.ndarray, b: np.ndarray, m: np.ndarray, m_neg_inv: np.ndarray) -> np.ndarray:
+    """
+    Montgomery multiplication: a * b * 2^-64 mod m, for a, b < m
+
+    Reference:
+        https://en.wikipedia.org/wiki/Montgomery_modular_multiplication#The_REDC_algorithm
+    """
+
+    hi, lo = _mul_wide(a, b)
+    u_hi, u_lo = _mul_wide(lo * m_neg_inv, m)
+
+    # (hi, lo) + (u_hi, u_lo) is divisible by 2^64, so we need only the high part and its carries
+    carry = (lo + u_lo < lo).astype(np.uint64)
+    high = hi + u_hi
+    overflow = high < hi
+    high += carry
+    overflow |= high < carry
+
+    # The result is smaller than 2m, so one subtraction is enough (it wraps back when the sum overflowed)
+    return np.where(overflow | (high >= m), high - m, high)
+
+
+def _add_mod(a: np.ndarray, b: np.ndarray, m: np.ndarray) -> np.ndarray:
+    """
+    a + b mod m, for a, b < m
+    """
+
+    total = a + b
+    return np.where((total < a) | (total >= m), total - m, total)
+
+
+def _miller_rabin(m: np.ndarray) -> np.ndarray:
+    """
+    Run the deterministic Miller-Rabin test on odd numbers larger than the witnesses' smallest prime factor
+
+    :param m: uint64 array of odd numbers
+    :return: A boolean mask of the numbers that are (strong probable) primes for all the witnesses
+    """
+
+    # -m^-1 mod 2^64 by Newton's iteration, every iteration doubles the number of correct bits (m * m = 1 mod 8)
+    m_inv = m.copy()
+    for _ in range(5):
+        m_inv *= np.uint64(2) - m * m_inv
+    m_neg_inv = np.uint64(0) - m_inv
+
+    # 2^64 mod m and 2^128 mod m, to convert numbers into Montgomery form
+    r1 = (np.uint64(0) - m) % m
+    r2 = r1.copy()
+    for _ in range(64):
+        r2 = _add_mod(r2, r2, m)
+
+    one = r1
+    minus_one = m - r1
+
+    # m - 1 = d * 2^s
+    d = m - _1
+    s = np.zeros(m.shape, dtype=np.int64)
+    while (even := (d & _1) == 0).any():
+        d = np.where(even, d >> _1, d)
+        s += even
+
+    is_prime = np.ones(m.shape, dtype=bool)
+    # The lanes which passed all the witnesses so far, most composites fail the first witness
+    active = np.arange(len(m))
+
+    for witness in WITNESSES:
+        a = np.uint64(witness) % m
+        skip = a == 0  # a witness divisible by m says nothing about m
+        base = _mont_mul(a, r2, m, m_neg_inv)
+
+        # x = a^d mod m, by square and multiply over the bits of d
+        x = one.copy()
+        for bit in range(int(d.max(initial=0)).bit_length() - 1, -1, -1):
+            x = _mont_mul(x, x, m, m_neg_inv)
+            x = np.where((d >> np.uint64(bit)) & _1 == 1, _mont_mul(x, base, m, m_neg_inv), x)
+
+        passed = skip | (x == one) | (x == minus_one)
+
+        # x^(2^r) for r = 1 .. s-1
+        for r in range(1, int(s.max(initial=0))):
+            x = _mont_mul(x, x, m, m_neg_inv)
+            passed |= (r < s) & (x == minus_one)
+
+        is_prime[active[~passed]] = False
+        active = active[passed]
+        m, m_neg_inv, one, minus_one, r2, d, s = (
+            arr[passed] for arr in (m, m_neg_inv, one, minus_one, r2, d, s)
+        )
+
+    return is_prime
+
+
+def is_prime_batch(numbers: np.ndarray) -> np.ndarray:
+    """
+    Test the primality of every number in an array
+
+    :param numbers: An array of non-negative integers smaller than 2^64
+    :return: A boolean mask of the prime numbers
+    """
+
+    numbers = np.asarray(numbers, dtype=np.uint64)
+    is_prime = np.zeros(numbers.shape, dtype=bool)
+    # Numbers divisible by a small prime are composites (unless they are the prime itself)
+    candidates = numbers > SMALL_PRIMES[-1]
+
+    for p in SMALL_PRIMES:
+        is_prime |= numbers == p
+        candidates &= numbers % np.uint64(p) != 0
+
+    is_prime[candidates] = _miller_rabin(numbers[candidates])
+
+    return is_prime
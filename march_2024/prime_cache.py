@@ -0,0 +1,116 @@
+"""
+An on-disk cache of the Sieve of Eratosthenes, used by the short sequence solver of the March 2024 challenge.
+
+Only the odd numbers are stored, packed 8 per byte: bit (m & 7) of byte (m >> 3) is set when 2m + 1 is a prime.
+The file has no header, so a file of b bytes covers the numbers below 16 * b.
+"""
+
+import os
+import shutil
+from math import isqrt
+
+import numpy as np
+
+SEGMENT_SIZE = 1 << 26  # number of odd numbers sieved at a time when extending the cache
+
+
+def _base_primes(limit: int) -> np.ndarray:
+    """
+    The odd primes up to 'limit' (inclusive)
+    """
+
+    # sieve[i] represents the number 2i + 1
+    sieve = np.ones(limit // 2 + 1, dtype=bool)
+    sieve[0] = False
+
+    for i in range(1, (isqrt(limit) - 1) // 2 + 1):
+        if sieve[i]:
+            p = 2 * i + 1
+            sieve[p * p // 2::p] = False
+
+    return 2 * np.flatnonzero(sieve) + 1
+
+
+class PrimeCache:
+    """
+    A sieve of the numbers below 'limit', stored in a file and opened read-only with a memory map.
+
+    Every process that opens the same file shares its pages, so concurrent solvers on the same host
+    load the sieve once. 'extend' sieves only the numbers above the current limit, writes the whole sieve
+    to a temporary file and renames it over the cache, so readers never see a partially written file.
+
+    primes[term] and primes[terms] test the primality of a number or a numpy array of numbers below 'limit'.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.bits: np.ndarray = np.zeros(0, dtype=np.uint8)
+        self._open()
+
+    @property
+    def limit(self) -> int:
+        return len(self.bits) << 4
+
+    def _open(self) -> None:
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            self.bits = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+    def extend(self, limit: int) -> None:
+        """
+        Make sure the cache covers all the numbers up to 'limit' (inclusive)
+        """
+
+        if limit < self.limit:
+            return
+
+        # The new limit is rounded up to whole bytes (16 numbers)
+        n_bytes = (limit >> 4) + 1
+        low = self.limit
+        high = n_bytes << 4
+        primes = _base_primes(isqrt(high))
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+
+        if low:
+            shutil.copyfile(self.path, tmp_path)
+
+        with open(tmp_path, "ab") as f:
+            for seg_low in range(low, high, 2 * SEGMENT_SIZE):
+                seg_high = min(seg_low + 2 * SEGMENT_SIZE, high)
+                # sieve[i] represents the odd number seg_low + 2i + 1
+                sieve = np.ones((seg_high - seg_low) // 2, dtype=bool)
+
+                for p in primes:
+                    p = int(p)
+
+                    if p * p >= seg_high:
+                        break
+
+                    # The first odd multiple of p in the segment (multiples below p^2 were removed by smaller primes)
+                    first = max(p * p, -(-seg_low // p) * p)
+
+                    if not first & 1:
+                        first += p
+
+                    sieve[(first - seg_low) // 2::p] = False
+
+                if seg_low == 0:
+                    sieve[0] = False  # 1 isn't a prime
+
+                f.write(np.packbits(sieve, bitorder="little").tobytes())
+
+        os.replace(tmp_path, self.path)
+        self._open()
+
+    def __getitem__(self, term):
+        if np.isscalar(term):
+            term = int(term)
+
+            if not term & 1:
+                return term == 2
+
+            return bool(self.bits[term >> 4] >> ((term >> 1) & 7) & 1)
+
+        term = np.asarray(term, dtype=np.int64)
+        is_prime = (self.bits[term >> 4] >> ((term >> 1) & 7).astype(np.uint8)) & 1
+
+        return np.where(term & 1 == 1, is_prime == 1, term == 2)